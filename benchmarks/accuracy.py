@@ -0,0 +1,99 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import argparse
+import json
+import sys
+from time import perf_counter
+
+from torch import Tensor
+
+from benchmarks.generator import generate_test_cases
+from benchmarks.run import BENCHMARK_COLUMNS
+from utils.cleaning import clean_data_frame
+from utils.inference import INFERENCE_BACKENDS
+from utils.model_registry import ModelRegistry
+from utils.similarity import compress_embeddings, extract_pairs_tiled
+
+
+# Function to encode the texts with the model of the registry, returns the embeddings and the duration of the encoding
+def encode_timed(registry: ModelRegistry, texts: list[str]) -> tuple[Tensor, float]:
+    registry.get()
+    start: float = perf_counter()
+    embeddings: Tensor = registry.encode(texts, convert_to_tensor=True)
+    return embeddings.cpu(), perf_counter() - start
+
+
+# Function to compare the pairs found above the cut-off with the reference pairs of the full precision model
+def pair_overlap(reference_pairs: set, pairs: set) -> dict:
+    common: int = len(reference_pairs & pairs)
+    return {
+        'reference_pairs': len(reference_pairs),
+        'pairs': len(pairs),
+        'recall': round(common / len(reference_pairs), 4) if reference_pairs else 1.0,
+        'precision': round(common / len(pairs), 4) if pairs else 1.0
+    }
+
+
+def find_pair_set(embeddings: Tensor, cutoff: float, dtype: str) -> set:
+    (rows, cols, _) = extract_pairs_tiled(embeddings, cutoff, dtype=dtype)
+    return set(zip(rows.tolist(), cols.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy and throughput of the reduced precision inference and '
+                                                 'embeddings against the full precision model')
+    parser.add_argument('--size', type=int, default=5000, help='Number of the generated test cases')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='Share of edited clones')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cutoff', type=float, default=0.8, help='Cut-off score')
+    parser.add_argument('--backend', choices=INFERENCE_BACKENDS, default='int8', help='Inference backend to compare')
+    parser.add_argument('--dtype', choices=['float32', 'float16', 'int8'], default='int8',
+                        help='Precision of the embeddings in the similarity stage to compare')
+    parser.add_argument('--output', help='Path the JSON report is written to, printed when omitted')
+    args = parser.parse_args()
+
+    texts: list[str] = clean_data_frame(generate_test_cases(args.size, args.duplicate_rate, seed=args.seed),
+                                        BENCHMARK_COLUMNS)
+    (reference_embeddings, reference_seconds) = encode_timed(ModelRegistry(backend='torch'), texts)
+    (embeddings, seconds) = encode_timed(ModelRegistry(backend=args.backend), texts)
+
+    reference_pairs: set = find_pair_set(reference_embeddings, args.cutoff, 'float32')
+    (compressed_embeddings, _) = compress_embeddings(reference_embeddings, args.dtype)
+    report: dict = {
+        'parameters': vars(args),
+        'encode': {
+            'reference_seconds': round(reference_seconds, 3),
+            'seconds': round(seconds, 3),
+            'speedup': round(reference_seconds / seconds, 2) if seconds else None
+        },
+        'embeddings_mb': {
+            'reference': round(reference_embeddings.float().nelement() * 4 / 2 ** 20, 2),
+            args.dtype: round(compressed_embeddings.element_size() * compressed_embeddings.nelement() / 2 ** 20, 2)
+        },
+        # Loss caused by the inference backend alone, by the precision of the embeddings alone and by both
+        'inference': pair_overlap(reference_pairs, find_pair_set(embeddings, args.cutoff, 'float32')),
+        'storage': pair_overlap(reference_pairs, find_pair_set(reference_embeddings, args.cutoff, args.dtype)),
+        'combined': pair_overlap(reference_pairs, find_pair_set(embeddings, args.cutoff, args.dtype))
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import argparse
+import random
+
+from pandas import DataFrame
+
+# Columns of the test cases exported from qTest
+ID_COLUMN = 'Id'
+NAME_COLUMN = 'Name'
+PRECONDITION_COLUMN = 'Precondition'
+STEP_DESCRIPTION_COLUMN = 'Test Step Description'
+EXPECTED_RESULT_COLUMN = 'Test Step Expected Result'
+COLUMNS = [ID_COLUMN, NAME_COLUMN, PRECONDITION_COLUMN, STEP_DESCRIPTION_COLUMN, EXPECTED_RESULT_COLUMN]
+
+ACTIONS = ['open', 'click', 'enter', 'select', 'submit', 'navigate to', 'upload', 'download', 'delete', 'edit',
+           'create', 'save', 'cancel', 'search for', 'filter', 'sort', 'export', 'import', 'log in to', 'log out of']
+OBJECTS = ['login page', 'user profile', 'settings dialog', 'order form', 'shopping cart', 'payment page',
+           'invoice', 'report', 'dashboard', 'search field', 'password field', 'email field', 'file', 'table',
+           'notification', 'account', 'product card', 'checkout button', 'admin panel', 'audit log']
+QUALIFIERS = ['with valid data', 'with invalid data', 'as an administrator', 'as a guest', 'on mobile device',
+              'in the new tab', 'after session timeout', 'with empty fields', 'with maximal length values',
+              'twice in a row', 'using keyboard only', 'with special characters', 'in the dark theme',
+              'without network connection', 'for the archived item', 'with the default settings']
+OUTCOMES = ['is displayed', 'is saved', 'is updated', 'is removed', 'shows an error', 'is disabled', 'is enabled',
+            'is sent', 'is highlighted', 'is sorted', 'is downloaded', 'contains the entered values']
+
+
+def generate_sentence(randomizer: random.Random, no_of_words: int) -> str:
+    words: list[str] = []
+    while len(words) < no_of_words:
+        words.extend(f'{randomizer.choice(ACTIONS)} the {randomizer.choice(OBJECTS)} '
+                     f'{randomizer.choice(QUALIFIERS)}'.split())
+    return ' '.join(words[:no_of_words])
+
+
+def generate_outcome(randomizer: random.Random) -> str:
+    return f'The {randomizer.choice(OBJECTS)} {randomizer.choice(OUTCOMES)}'
+
+
+# Function to make a trivially edited clone of the text: some of the words are replaced, dropped or swapped
+def mutate(randomizer: random.Random, text: str, rate: float = 0.1) -> str:
+    words: list[str] = text.split(' ')
+    for position in range(len(words)):
+        if randomizer.random() < rate:
+            edit: int = randomizer.randrange(3)
+            if edit == 0:
+                words[position] = randomizer.choice(generate_sentence(randomizer, 8).split())
+            elif edit == 1:
+                words[position] = ''
+            elif position + 1 < len(words):
+                (words[position], words[position + 1]) = (words[position + 1], words[position])
+    return ' '.join(word for word in words if word)
+
+
+# Function to generate qTest-like test cases in the prepared layout, one row per test case with the steps
+# joined by new lines. The given share of the test cases are edited clones of the other ones
+def generate_test_cases(size: int, duplicate_rate: float = 0.2, words_per_step: int = 12, steps_per_case: int = 4,
+                        seed: int = 0) -> DataFrame:
+    randomizer: random.Random = random.Random(seed)
+    records: list[dict] = []
+    for _ in range(size):
+        if records and randomizer.random() < duplicate_rate:
+            original: dict = randomizer.choice(records)
+            record: dict = {column: mutate(randomizer, value) for (column, value) in original.items()}
+        else:
+            no_of_steps: int = max(1, steps_per_case + randomizer.randint(-1, 1))
+            record: dict = {
+                NAME_COLUMN: generate_sentence(randomizer, 6),
+                PRECONDITION_COLUMN: generate_sentence(randomizer, words_per_step),
+                STEP_DESCRIPTION_COLUMN: '\n'.join(generate_sentence(randomizer, words_per_step)
+                                                   for _ in range(no_of_steps)),
+                EXPECTED_RESULT_COLUMN: '\n'.join(generate_outcome(randomizer) for _ in range(no_of_steps))
+            }
+        records.append(record)
+    return DataFrame([{ID_COLUMN: f'TC-{index + 1}', **record} for (index, record) in enumerate(records)],
+                     columns=COLUMNS)
+
+
+# Function to convert the test cases into the raw layout of qTest excel export expected by QtestExcelDataLoader:
+# one row per step, where only the first row of the test case has the name and the precondition
+def to_raw_layout(test_cases: DataFrame) -> DataFrame:
+    rows: list[dict] = []
+    for test_case in test_cases.to_dict('records'):
+        steps: list[str] = test_case[STEP_DESCRIPTION_COLUMN].split('\n')
+        outcomes: list[str] = test_case[EXPECTED_RESULT_COLUMN].split('\n')
+        for (position, step) in enumerate(steps):
+            rows.append({
+                ID_COLUMN: test_case[ID_COLUMN],
+                NAME_COLUMN: test_case[NAME_COLUMN] if position == 0 else None,
+                PRECONDITION_COLUMN: test_case[PRECONDITION_COLUMN] if position == 0 else None,
+                STEP_DESCRIPTION_COLUMN: step,
+                EXPECTED_RESULT_COLUMN: outcomes[position] if position < len(outcomes) else None
+            })
+    return DataFrame(rows, columns=COLUMNS)
+
+
+def write_test_cases(test_cases: DataFrame, output_path: str, sheet_name: str = 'Test Cases'):
+    if output_path.endswith('.csv'):
+        test_cases.to_csv(output_path, index=False)
+    else:
+        test_cases.to_excel(output_path, sheet_name=sheet_name, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generator of synthetic qTest-like test cases')
+    parser.add_argument('--size', type=int, required=True, help='Number of test cases')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='Share of edited clones')
+    parser.add_argument('--words', type=int, default=12, help='Number of words per step')
+    parser.add_argument('--steps', type=int, default=4, help='Average number of steps per test case')
+    parser.add_argument('--raw', action='store_true', help='Raw layout of qTest export with one row per step')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True, help='Path of csv or xlsx file')
+    args = parser.parse_args()
+
+    test_cases: DataFrame = generate_test_cases(args.size, args.duplicate_rate, args.words, args.steps, args.seed)
+    write_test_cases(to_raw_layout(test_cases) if args.raw else test_cases, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timezone
+from os import cpu_count, path, rmdir
+from types import SimpleNamespace
+from typing import Optional
+
+import pandas as pd
+import torch
+from pandas import DataFrame
+
+import deduplicate
+from benchmarks.generator import COLUMNS, ID_COLUMN, generate_test_cases, to_raw_layout, write_test_cases
+from deduplicate import calculate_similarity
+from utils.embedding_cache import EmbeddingCache
+from utils.metrics import RequestMetrics
+from utils.model_registry import model_registry
+from utils.prefilter import PREFILTER
+from utils.profiling import StageProfiler
+from utils.similarity import SIMILARITY_BACKEND
+
+# Columns compared by the benchmark
+BENCHMARK_COLUMNS = COLUMNS[1:]
+
+
+# Function to run the deduplication of the service over the generated test cases of the given size. The stages
+# and the counts are the metrics of the request, and the result is written into the work folder
+def run_benchmark(size: int, args: argparse.Namespace, work_folder: str) -> dict:
+    test_cases: DataFrame = generate_test_cases(size, args.duplicate_rate, args.words, args.steps, args.seed)
+    input_path: str = path.join(work_folder, f'test_cases_{size}.{args.format}')
+    write_test_cases(to_raw_layout(test_cases) if args.raw else test_cases, input_path)
+    del test_cases
+
+    metrics: RequestMetrics = RequestMetrics('benchmark')
+    (message, out_path) = calculate_similarity(SimpleNamespace(name=input_path), args.raw, 'Test Cases', 'utf-8', ',',
+                                               ID_COLUMN, ','.join(BENCHMARK_COLUMNS), args.cutoff, '', False,
+                                               args.low_memory, args.clusters, args.prefilter, 'xlsx',
+                                               args.diff_top_k, metrics)
+    if metrics.status != 'ok':
+        raise RuntimeError(message)
+    if out_path:
+        shutil.move(out_path, path.join(work_folder, f'benchmark_{size}.xlsx'))
+        rmdir(path.dirname(out_path))
+
+    request: dict = metrics.to_dict()
+    return {
+        'size': size,
+        'rows': request['counts'].get('rows', 0),
+        'pairs': request['counts'].get('pairs', 0),
+        'total_seconds': metrics.profiler.total_seconds,
+        'seconds': request['seconds'],
+        'stages': request['stages'],
+        'counts': request['counts']
+    }
+
+
+# Function to compare the durations of the stages with the baseline report of the previous version
+def compare_with_baseline(report: dict, baseline: dict) -> list[str]:
+    lines: list[str] = []
+    baseline_results: dict[int, dict] = {result['size']: result for result in baseline['results']}
+    for result in report['results']:
+        previous: Optional[dict] = baseline_results.get(result['size'])
+        if previous is None:
+            continue
+        for (stage_name, stage) in result['stages'].items():
+            previous_stage: Optional[dict] = previous['stages'].get(stage_name)
+            if previous_stage and previous_stage['seconds'] > 0:
+                change: float = (stage['seconds'] - previous_stage['seconds']) / previous_stage['seconds'] * 100
+                lines.append(f"size {result['size']:>8} {stage_name:<12} {previous_stage['seconds']:>10.3f}s -> "
+                             f"{stage['seconds']:>10.3f}s ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of the deduplication stages')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help='Numbers of the generated test cases')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='Share of edited clones')
+    parser.add_argument('--words', type=int, default=12, help='Number of words per step')
+    parser.add_argument('--steps', type=int, default=4, help='Average number of steps per test case')
+    parser.add_argument('--raw', action='store_true', help='Raw layout of qTest export with one row per step')
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='xlsx', help='Format of the generated file')
+    parser.add_argument('--cutoff', type=float, default=0.8, help='Cut-off score')
+    parser.add_argument('--low-memory', action='store_true', help='Load and clean the document chunk by chunk')
+    parser.add_argument('--clusters', action='store_true', help='Group the duplicate pairs into clusters')
+    parser.add_argument('--prefilter', action=argparse.BooleanOptionalAction, default=PREFILTER,
+                        help='Collapse exact and near-exact copies before the embedding')
+    parser.add_argument('--diff-top-k', type=int, default=0,
+                        help='Number of the pairs with the highest scores the diffs are calculated for, 0 for all')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Path the JSON report is written to, printed when omitted')
+    parser.add_argument('--baseline', help='JSON report of the previous version to compare the durations with')
+    args = parser.parse_args()
+    if args.raw:
+        args.format = 'xlsx'
+
+    # Embedding cache is disabled, otherwise every run after the first one would measure the cache
+    deduplicate.embedding_cache = EmbeddingCache(max_size_mb=0)
+    model_load: StageProfiler = StageProfiler()
+    with model_load.stage('model_load'):
+        model_registry.get()
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        results: list[dict] = [run_benchmark(size, args, work_folder) for size in args.sizes]
+
+    report: dict = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': cpu_count(),
+            'model': model_registry.model_name,
+            'inference_backend': model_registry.backend,
+            'similarity_backend': SIMILARITY_BACKEND
+        },
+        'parameters': {key: value for (key, value) in vars(args).items() if key not in ('output', 'baseline')},
+        'model_load': model_load.stages['model_load'],
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            print('\n'.join(compare_with_baseline(report, json.load(baseline_file))), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import argparse
+import logging
+import shutil
+import sys
+from os import cpu_count, path, rmdir
+from types import SimpleNamespace
+
+from deduplicate import DIFF_TOP_K, calculate_similarity, query_similarity_batch
+from utils.export import OUTPUT_FORMAT, OUTPUT_FORMATS
+from utils.model_registry import model_registry
+from utils.prefilter import PREFILTER
+
+
+def add_data_source_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--input', required=True, help='Test cases in csv or xlsx or xls format')
+    parser.add_argument('--raw', action='store_true',
+                        help='Unprepared data sheet in excel imported from qTest')
+    parser.add_argument('--sheet', default='', help='Excel sheet name, required for xlsx files')
+    parser.add_argument('--encoding', default='utf-8', help='Encoding of the csv file')
+    parser.add_argument('--delimiter', default=',', help='Delimiter of the list of columns')
+    parser.add_argument('--id-column', required=True, help='Column name with entity ID')
+    parser.add_argument('--columns', required=True,
+                        help='Delimiter separated list of columns to be used for duplicates detection')
+    parser.add_argument('--cutoff', type=float, default=0.8, help='Cut-off score')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='Read only the ID column and the columns used for duplicates detection')
+    parser.add_argument('--output', required=True,
+                        help='Path the generated file with duplicates is written to, its extension chooses '
+                             'the format: xlsx, csv or parquet')
+    parser.add_argument('--workers', type=int, default=cpu_count() or 1,
+                        help='Number of processes encoding the test cases')
+    parser.add_argument('--no-progress', action='store_true', help="Don't show the progress of the encoding")
+
+
+def parse_arguments(arguments: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Deduplication of entities without the web interface')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    dedupe_parser = subparsers.add_parser('dedupe', help='Find duplicates within the document or of a test case')
+    add_data_source_arguments(dedupe_parser)
+    dedupe_parser.add_argument('--test-case', default='', help='Test case in JSON format to look duplicates for')
+    dedupe_parser.add_argument('--incremental', action='store_true',
+                               help='Compare only new and changed rows against the persisted test cases')
+    dedupe_parser.add_argument('--clusters', action='store_true',
+                               help='Group duplicates into clusters compared with their representatives')
+    dedupe_parser.add_argument('--prefilter', action=argparse.BooleanOptionalAction, default=PREFILTER,
+                               help='Collapse exact and near-exact copies before the embedding')
+    dedupe_parser.add_argument('--diff-top-k', type=int, default=DIFF_TOP_K,
+                               help='Number of the pairs with the highest scores the diffs are calculated for, '
+                                    '0 for all of them')
+
+    query_parser = subparsers.add_parser('query', help='Look up test cases from a JSONL file in the document')
+    add_data_source_arguments(query_parser)
+    query_parser.add_argument('--queries', required=True, help='Test cases to look up, one JSON object per line')
+    query_parser.add_argument('--top-k', type=int, default=5,
+                              help='Number of the most similar test cases per query')
+    return parser.parse_args(arguments)
+
+
+# Function to choose the format of the result by the extension of the output path
+def output_format_of(output_path: str) -> str:
+    extension: str = path.splitext(output_path)[1].lstrip('.').lower()
+    return extension if extension in OUTPUT_FORMATS else OUTPUT_FORMAT
+
+
+def main(arguments: list[str]) -> int:
+    args: argparse.Namespace = parse_arguments(arguments)
+    # Per-request metrics are logged as a JSON line to stderr, so the output of the command stays the same
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    output_format: str = output_format_of(args.output)
+    model_registry.encode_workers = args.workers
+    model_registry.show_progress_bar = not args.no_progress
+
+    data_source = SimpleNamespace(name=args.input)
+    try:
+        if args.command == 'dedupe':
+            (message, out_path) = calculate_similarity(data_source, args.raw, args.sheet, args.encoding,
+                                                       args.delimiter, args.id_column, args.columns, args.cutoff,
+                                                       args.test_case, args.incremental, args.low_memory,
+                                                       args.clusters, args.prefilter, output_format,
+                                                       args.diff_top_k)
+        else:
+            (message, out_path) = query_similarity_batch(data_source, args.raw, args.sheet, args.encoding,
+                                                         args.delimiter, args.id_column, args.columns,
+                                                         SimpleNamespace(name=args.queries), args.cutoff,
+                                                         args.top_k, args.low_memory, output_format)
+    finally:
+        model_registry.stop_pool()
+
+    print(message)
+    if message.startswith('Error'):
+        return 1
+    if out_path is not None:
+        shutil.move(out_path, args.output)
+        rmdir(path.dirname(out_path))
+        print(f'Result is written to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
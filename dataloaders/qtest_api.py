@@ -11,27 +11,43 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License
 import string
-from typing import Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, Optional
 from gensim.parsing.preprocessing import strip_tags
 from pandas import DataFrame
 from ordered_set import OrderedSet
 import os
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.results import RecordBuilder
 
 PAGE_NUMBER = 1
+# Base URL of the qTest instance, may point to a local stub server for testing
+QTEST_BASE_URL = os.environ.get("DEDUPE_QTEST_URL", "https://ctcprod.qtestnet.com")
+# Maximal number of pages requested at once
+MAX_CONCURRENT_PAGES = int(os.environ.get("DEDUPE_QTEST_CONCURRENT_PAGES", 4))
+# Number of retries of a failed request, the delay between them grows exponentially
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+REQUEST_TIMEOUT_SECONDS = 60
 
 
 class QTestApiDataLoader:
 
-    def __init__(self, project_id: str, no_of_test_cases_per_page: int, module_id: Optional[str] = None):
+    def __init__(self, project_id: str, no_of_test_cases_per_page: int, module_id: Optional[str] = None,
+                 base_url: str = QTEST_BASE_URL, max_concurrent_pages: int = MAX_CONCURRENT_PAGES):
         self.project_id = project_id
         self.no_of_test_cases_per_page = no_of_test_cases_per_page
-        if module_id is not None:
-            self.module_id = module_id
+        self.module_id = module_id
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrent_pages = max(1, max_concurrent_pages)
 
     def __prepare_request_endpoint(self, page_number: Optional[int] = None) -> tuple:
-        url_str: str = f'https://ctcprod.qtestnet.com/api/v3/projects/{self.project_id}/test-cases'
+        url_str: str = f'{self.base_url}/api/v3/projects/{self.project_id}/test-cases'
         params = {
             'size': self.no_of_test_cases_per_page,
             'expandSteps': 'true'
@@ -46,33 +62,59 @@ class QTestApiDataLoader:
             params['parentId'] = self.module_id
         return url_str, params
 
-    def fetch_test_cases_from_qtest_as_data_frame(self) -> DataFrame:
-        request_headers: dict = {'Authorization': os.environ["BEARER_TOKEN"], 'content_type': 'application/json'}
-        no_of_test_cases_returned_by_api_per_page = self.no_of_test_cases_per_page
-        no_of_pages_counter = PAGE_NUMBER
-
-        test_cases_data_frame: DataFrame = pd.DataFrame()
+    # Session reusing the connections of the pool between the requests and retrying the failed ones
+    def __create_session(self) -> requests.Session:
+        session: requests.Session = requests.Session()
+        retry: Retry = Retry(total=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR,
+                             status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+        adapter: HTTPAdapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrent_pages,
+                                           max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Authorization': os.environ["BEARER_TOKEN"], 'content_type': 'application/json'})
+        return session
 
-        while no_of_test_cases_returned_by_api_per_page == self.no_of_test_cases_per_page:
-            request_endpoint_tuple: tuple = self.__prepare_request_endpoint(no_of_pages_counter)
-            json_response = requests.get(url=request_endpoint_tuple[0], params=request_endpoint_tuple[1],
-                                         headers=request_headers).json()
+    def __fetch_page(self, session: requests.Session, page_number: int) -> list:
+        request_endpoint_tuple: tuple = self.__prepare_request_endpoint(page_number)
+        response: requests.Response = session.get(url=request_endpoint_tuple[0], params=request_endpoint_tuple[1],
+                                                  timeout=REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return response.json()
 
-            no_of_test_cases_returned_by_api_per_page = len(json_response)
-            if no_of_test_cases_returned_by_api_per_page < 1:
-                break
+    # Function to fetch the pages concurrently with a bounded number of them in flight. Parsed pages are yielded
+    # in order as soon as they arrive, so the processing can start before the whole project is downloaded
+    def iterate_test_case_pages(self) -> Iterator[DataFrame]:
+        def fetch_and_transform(page_number: int) -> tuple[int, DataFrame]:
+            json_response: list = self.__fetch_page(session, page_number)
+            return len(json_response), self.__transform_test_data_into_dict(json_response)
 
-            temp_data_frame: DataFrame = self.__transform_test_data_into_dict(json_response)
-            test_cases_data_frame = test_cases_data_frame._append(temp_data_frame, ignore_index=True)
-            no_of_pages_counter += 1
+        with self.__create_session() as session, ThreadPoolExecutor(max_workers=self.max_concurrent_pages) as executor:
+            in_flight: deque[Future] = deque(executor.submit(fetch_and_transform, page_number)
+                                             for page_number in range(PAGE_NUMBER,
+                                                                      PAGE_NUMBER + self.max_concurrent_pages))
+            next_page_number: int = PAGE_NUMBER + self.max_concurrent_pages
+            while in_flight:
+                (no_of_test_cases_returned_by_api_per_page, page_data_frame) = in_flight.popleft().result()
+                if no_of_test_cases_returned_by_api_per_page < 1:
+                    break
+                yield page_data_frame
+                # Page shorter than requested is the last one
+                if no_of_test_cases_returned_by_api_per_page < self.no_of_test_cases_per_page:
+                    break
+                in_flight.append(executor.submit(fetch_and_transform, next_page_number))
+                next_page_number += 1
+            for future in in_flight:
+                future.cancel()
 
-        return test_cases_data_frame
+    def fetch_test_cases_from_qtest_as_data_frame(self) -> DataFrame:
+        pages: list[DataFrame] = list(self.iterate_test_case_pages())
+        return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
 
     @staticmethod
     def __transform_test_data_into_dict(json_response: list) -> DataFrame:
         fields_to_pick_from_api_response: list = ['name', 'pid', 'description', 'precondition', 'test_steps']
         api_data_dict: dict = {}
-        data_frame: DataFrame = pd.DataFrame()
+        record_builder: RecordBuilder = RecordBuilder()
 
         for json_response_current_object in json_response:
             for key_name in json_response_current_object:
@@ -102,5 +144,5 @@ class QTestApiDataLoader:
                             api_data_dict['Id'] = current_key_data
                         else:
                             api_data_dict[string.capwords(key_name)] = current_key_data
-            data_frame = data_frame._append(api_data_dict, ignore_index=True)
-        return data_frame
+            record_builder.append(api_data_dict)
+        return record_builder.build()
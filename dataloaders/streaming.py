@@ -0,0 +1,111 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+from os import environ
+from typing import Iterator, Optional
+
+import pandas as pd
+from openpyxl import load_workbook
+from pandas import DataFrame
+
+from utils.cleaning import clean_special_characters_from_data_frame
+
+# Number of rows read at once
+STREAMING_CHUNK_SIZE = int(environ.get("DEDUPE_STREAMING_CHUNK_SIZE", 10000))
+
+
+# Loader reading only the needed columns of csv or xlsx documents chunk by chunk,
+# so the whole document is never loaded into memory with all its columns
+class StreamingDataLoader:
+    def __init__(self, input_path: str, columns: list[str], encoding: str = 'utf-8',
+                 sheet_name: Optional[str] = None, chunk_size: int = STREAMING_CHUNK_SIZE):
+        self.input_path = input_path
+        self.columns = list(dict.fromkeys(columns))
+        self.encoding = encoding
+        self.sheet_name = sheet_name
+        self.chunk_size = chunk_size
+
+    def iterate_chunks(self) -> Iterator[DataFrame]:
+        if self.input_path.__contains__('csv'):
+            yield from pd.read_csv(self.input_path, encoding=self.encoding, usecols=self.columns,
+                                   chunksize=self.chunk_size)
+        else:
+            for chunk in self.iterate_excel_rows():
+                yield DataFrame(chunk, columns=self.columns).fillna("")
+
+    # Function to iterate over the rows of the needed columns of the sheet in chunks of lists of values
+    def iterate_excel_rows(self) -> Iterator[list[list]]:
+        workbook = load_workbook(self.input_path, read_only=True, data_only=True)
+        try:
+            rows = (workbook[self.sheet_name] if self.sheet_name else workbook.active).iter_rows(values_only=True)
+            header: tuple = next(rows, ())
+            missing_columns: list[str] = [column for column in self.columns if column not in header]
+            if missing_columns:
+                raise ValueError(f'Columns {missing_columns} are not found in the sheet')
+            positions: list[int] = [header.index(column) for column in self.columns]
+
+            chunk: list[list] = []
+            for row in rows:
+                chunk.append([row[position] if position < len(row) else None for position in positions])
+                if len(chunk) == self.chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            workbook.close()
+
+
+# Streaming counterpart of QtestExcelDataLoader: rows of the steps are merged into their test case while the sheet
+# is read, keeping the first row of every test case the same way as the groupby and drop_duplicates do
+class StreamingQtestExcelDataLoader(StreamingDataLoader):
+    def __init__(self, input_path: str, list_of_columns_to_check_for_nan: list[str], columns: list[str],
+                 column_name_needed_to_be_merged: str = 'Test Step Description',
+                 test_case_id_column_name: str = 'Id',
+                 sheet_name: str = 'Test Cases',
+                 chunk_size: int = STREAMING_CHUNK_SIZE):
+        super().__init__(input_path, [test_case_id_column_name, *columns, *list_of_columns_to_check_for_nan,
+                                      column_name_needed_to_be_merged],
+                         sheet_name=sheet_name, chunk_size=chunk_size)
+        self.list_of_columns_to_check_for_nan = list_of_columns_to_check_for_nan
+        self.column_name_needed_to_be_merged = column_name_needed_to_be_merged
+        self.test_case_id_column_name = test_case_id_column_name
+
+    def create_prepared_data_frame_from_excel_file(self) -> DataFrame:
+        delimiter = '\n'
+        id_position: int = self.columns.index(self.test_case_id_column_name)
+        merged_position: int = self.columns.index(self.column_name_needed_to_be_merged)
+        nan_check_positions: list[int] = [self.columns.index(column)
+                                          for column in self.list_of_columns_to_check_for_nan]
+
+        test_cases: dict[object, list] = {}
+        steps: dict[object, list[str]] = {}
+        for chunk in self.iterate_excel_rows():
+            for row in chunk:
+                if all(row[position] is None for position in nan_check_positions):
+                    continue
+                row = ["" if value is None else value for value in row]
+                test_case_id = row[id_position]
+                if test_case_id not in test_cases:
+                    test_cases[test_case_id] = row
+                    steps[test_case_id] = []
+                steps[test_case_id].append(str(row[merged_position]))
+
+        for (test_case_id, row) in test_cases.items():
+            row[merged_position] = delimiter.join(steps[test_case_id])
+        output_df: DataFrame = DataFrame(list(test_cases.values()), columns=self.columns)
+
+        # Removing \r and _x000D_ from all the output data frame values
+        clean_special_characters_from_data_frame(output_df)
+
+        return output_df
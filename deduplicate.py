@@ -11,26 +11,222 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License
 
-import tempfile
+import logging
+from contextlib import nullcontext
 from json import loads
-from os import path, environ
+from os import environ
+from typing import Optional
 from traceback import format_exc
 
 import gradio as gr
 import pandas as pd
+import torch
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pandas import DataFrame
-from sentence_transformers import SentenceTransformer, util
 from torch import Tensor
+from torch.nn.functional import normalize
 
 from dataloaders.qtest_excel import QtestExcelDataLoader
+from dataloaders.streaming import StreamingDataLoader, StreamingQtestExcelDataLoader
+from utils.ann import recall_against_exact
+from utils.corpus import CORPUS_PATH, PersistedCorpus
+from utils.embedding_cache import EmbeddingCache
+from utils.export import OUTPUT_FORMAT, OUTPUT_FORMATS, export_result
+from utils.metrics import RequestMetrics, metrics_registry
+from utils.model_registry import ModelRegistry, model_registry
+from utils.prefilter import PREFILTER, expand_prefiltered_pairs, prefilter_texts
+from utils.clustering import cluster_pairs
+from utils.results import RecordBuilder, build_clusters_data_frame, build_pairs_data_frame, widen_score_columns
+from utils.similarity import composite_scores, compress_embeddings, extract_pairs_tiled, find_pairs, search, \
+    SIMILARITY_BACKEND
 from utils.stringdiff import equalize
-from utils.cleaning import clean_data_frame, cleanse_document, clean_special_characters_from_data_frame
+from utils.cleaning import clean_data_frame, cleanse_document
+
+embedding_cache = EmbeddingCache()
+
+# Columns of raw qTest exports, rows with all of them empty are skipped
+RAW_DATA_COLUMNS = ['Precondition', 'Test Step Description', 'Test Step Expected Result']
+
+# Load the model in background at startup instead of on the first request
+PRELOAD_MODEL = environ.get("DEDUPE_PRELOAD_MODEL", "true").lower() == "true"
+# Report recall of the approximate search against the exact one with every result, used to tune the index
+ANN_RECALL_REPORT = environ.get("DEDUPE_ANN_RECALL_REPORT", "false").lower() == "true"
+# Number of the pairs with the highest scores the diffs are calculated for, 0 for all of them
+DIFF_TOP_K = int(environ.get("DEDUPE_DIFF_TOP_K", 0))
+
+
+# Function to calculate composite scores of the pairs. Every column of the rows participating in the pairs
+# is cleansed and encoded only once in a single batch, and the scores are gathered over the pair indices
+def encode_composite_scores(model: ModelRegistry, data_frame: DataFrame, cols: list[str],
+                            rows: Tensor, jrows: Tensor, cache_stats: dict) -> Tensor:
+    if len(rows) == 0:
+        return torch.zeros(0)
+    unique_rows: Tensor = torch.unique(torch.cat([rows, jrows]))
+    texts: list[str] = [cleanse_document({col: str(data_frame.at[index, col])}, [col])
+                        for col in cols for index in unique_rows.tolist()]
+    (embeddings, stats) = embedding_cache.encode(model, model.model_key, texts)
+    for (key, value) in stats.items():
+        cache_stats[key] += value
+    embeddings = normalize(embeddings.cpu(), dim=1)
+    column_embeddings: list[Tensor] = list(embeddings.split(len(unique_rows)))
+    return composite_scores(column_embeddings, torch.searchsorted(unique_rows, rows.cpu()),
+                            torch.searchsorted(unique_rows, jrows.cpu()))
+
+
+# Function to calculate the scores of the pairs from the normalized embeddings of the cleaned texts. The embeddings
+# of all the rows are reused when they are given, otherwise only the rows of the pairs are taken from the cache
+# or encoded
+def encode_pair_scores(model: ModelRegistry, prepared_data_list: list[str], rows: Tensor, jrows: Tensor,
+                       cache_stats: dict, embeddings: Optional[Tensor] = None) -> Tensor:
+    if len(rows) == 0:
+        return torch.zeros(0)
+    if embeddings is None:
+        unique_rows: Tensor = torch.unique(torch.cat([rows, jrows]))
+        (embeddings, stats) = embedding_cache.encode(model, model.model_key,
+                                                     [prepared_data_list[index] for index in unique_rows.tolist()])
+        for (key, value) in stats.items():
+            cache_stats[key] += value
+        (rows, jrows) = (torch.searchsorted(unique_rows, rows), torch.searchsorted(unique_rows, jrows))
+    (embeddings, scale) = compress_embeddings(embeddings.cpu())
+    return (embeddings[rows].float() * embeddings[jrows].float()).sum(dim=1) * scale
+
+
+# Function to find the pairs incrementally against the persisted corpus. Deleted and changed rows are invalidated,
+# only new and changed rows are embedded and compared against the corpus, and the new pairs are appended to it.
+# Returns the pairs as positions in the data frame along with the scores and composite scores
+def find_pairs_incrementally(model: ModelRegistry, data_frame: DataFrame, idcol: str, cols: list[str],
+                             prepared_data_list: list[str], cutoff: float, cache_stats: dict,
+                             corpus_path: str = CORPUS_PATH) -> tuple[Tensor, Tensor, Tensor, Tensor]:
+    ids: list[str] = data_frame[idcol].astype(str).tolist()
+    if len(set(ids)) != len(ids):
+        raise ValueError(f'Column {idcol} must contain unique IDs for incremental deduplication')
+
+    corpus: PersistedCorpus = PersistedCorpus(model.model_key, idcol, cols, corpus_path)
+    with corpus.locked():
+        corpus.load()
+        (new_positions, _) = corpus.synchronize(ids, prepared_data_list)
+
+        # Known pairs are complete only for the cut-off they were looked for with, so lower cut-off needs all of them
+        start: int = len(corpus)
+        if corpus.cutoff is None or cutoff < corpus.cutoff:
+            corpus.clear_pairs()
+            start = 0
+        corpus.cutoff = cutoff
+
+        if new_positions:
+            new_texts: list[str] = [prepared_data_list[position] for position in new_positions]
+            (new_embeddings, stats) = embedding_cache.encode(model, model.model_key, new_texts)
+            for (key, value) in stats.items():
+                cache_stats[key] += value
+            corpus.append([ids[position] for position in new_positions], new_texts, new_embeddings.cpu().numpy())
+        if not len(corpus):
+            return torch.zeros(0, dtype=torch.long), torch.zeros(0, dtype=torch.long), torch.zeros(0), torch.zeros(0)
+
+        row_of_id: dict[str, int] = {item_id: position for (position, item_id) in enumerate(ids)}
+        positions: Tensor = torch.tensor([row_of_id[item_id] for item_id in corpus.items['id']], dtype=torch.long)
+        (rows, jrows, scores) = extract_pairs_tiled(torch.from_numpy(corpus.embeddings), cutoff, start=start)
+        pair_composite_scores: Tensor = encode_composite_scores(model, data_frame, cols, positions[rows],
+                                                                positions[jrows], cache_stats)
+        corpus.add_pairs(corpus.items['id'].iloc[rows.tolist()].tolist(),
+                         corpus.items['id'].iloc[jrows.tolist()].tolist(),
+                         scores.tolist(), pair_composite_scores.tolist())
+        corpus.save()
+
+        known_pairs: DataFrame = corpus.pairs[corpus.pairs['score'] > cutoff]
+        return (torch.tensor([row_of_id[item_id] for item_id in known_pairs['id_1']], dtype=torch.long),
+                torch.tensor([row_of_id[item_id] for item_id in known_pairs['id_2']], dtype=torch.long),
+                torch.tensor(known_pairs['score'].tolist()),
+                torch.tensor(known_pairs['composite_score'].tolist()))
+
+
+# Function to load only the ID and the selected columns of the document chunk by chunk, cleaning every chunk
+# as soon as it is read. Step rows of raw qTest exports are merged into their test cases while the sheet is read
+def load_and_clean_streaming(input_path: str, is_raw_data: bool, excel_sheet_name: str, encoding: str, idcol: str,
+                             cols: list[str]) -> tuple[DataFrame, list[str]]:
+    if is_raw_data:
+        data_loader = StreamingQtestExcelDataLoader(input_path, RAW_DATA_COLUMNS, cols, sheet_name=excel_sheet_name,
+                                                    test_case_id_column_name=idcol)
+        initial_data: DataFrame = data_loader.create_prepared_data_frame_from_excel_file()
+        return initial_data, clean_data_frame(initial_data, cols)
+
+    data_loader = StreamingDataLoader(input_path, [idcol, *cols], encoding=encoding, sheet_name=excel_sheet_name)
+    chunks: list[DataFrame] = []
+    prepared_data_list: list[str] = []
+    for chunk in data_loader.iterate_chunks():
+        chunks.append(chunk)
+        prepared_data_list.extend(clean_data_frame(chunk, cols))
+    initial_data: DataFrame = pd.concat(chunks, ignore_index=True) if chunks else DataFrame(columns=[idcol, *cols])
+    return initial_data, prepared_data_list
+
+
+# Function to load the document and clean the columns used for duplicates detection. Streaming loading cleans
+# every chunk as soon as it is read, so both are measured as a single stage
+def load_and_clean(input_path: str, is_raw_data: bool, excel_sheet_name: str, encoding: str, idcol: str,
+                   cols: list[str], low_memory: bool = False,
+                   metrics: Optional[RequestMetrics] = None) -> tuple[DataFrame, list[str]]:
+    stage = metrics.stage if metrics else lambda name: nullcontext()
+    if low_memory:
+        with stage('load_and_clean'):
+            return load_and_clean_streaming(input_path, is_raw_data, excel_sheet_name, encoding, idcol, cols)
+
+    with stage('load'):
+        if is_raw_data:
+            data_loader = QtestExcelDataLoader(input_path, RAW_DATA_COLUMNS,
+                                               sheet_name=excel_sheet_name, test_case_id_column_name=idcol)
+            initial_data: DataFrame = data_loader.create_prepared_data_frame_from_excel_file()
+        else:
+            if input_path.__contains__('csv'):
+                initial_data: DataFrame = pd.read_csv(input_path, encoding=encoding)
+            else:
+                initial_data: DataFrame = pd.read_excel(input_path, sheet_name=excel_sheet_name)
+                initial_data.fillna("", inplace=True)
+
+    with stage('clean'):
+        return initial_data, clean_data_frame(initial_data, cols)
+
+
+# Function to add the records of the corpus entries found for the test case with the score above the cut-off
+def append_query_records(record_builder: RecordBuilder, test_case: dict, issues: list[dict], initial_data: DataFrame,
+                         cols: list[str], cutoff: float, query_no: Optional[int] = None):
+    for issue in issues:
+        if issue['score'] >= cutoff:
+            record = {} if query_no is None else {'Query #': query_no}
+            record['Score'] = round(issue['score'], 3)
+            for col in initial_data.columns:
+                if col in cols:
+                    (col1, col2) = equalize(test_case[col], initial_data.at[issue['corpus_id'], col])
+                    record[f'{col} #1'] = col1
+                    record[f'{col} #2'] = col2
+                else:
+                    record[f'{col} #1'] = test_case.get(col, '')
+                    record[f'{col} #2'] = initial_data.at[issue['corpus_id'], col]
+            record_builder.append(record)
+
+
+# Function to write the sorted result into the own folder of the request, returns None when there is nothing to write
+def write_result(result_data_frame: DataFrame, sort_columns: list[str], ascending: list[bool],
+                 file_name: str, output_format: str = OUTPUT_FORMAT) -> Optional[str]:
+    if result_data_frame.empty:
+        return None
+    result_data_frame.sort_values(sort_columns, ascending=ascending, inplace=True)
+    widen_score_columns(result_data_frame)
+    return export_result(result_data_frame, file_name, output_format)
 
 
 def calculate_similarity(data_source, is_raw_data: bool, excel_sheet_name: str, encoding: str, delimiter: str,
                          idcol: str, columns: str,
                          cutoff: float = 0.8,
-                         test_steps: str = ''):
+                         test_steps: str = '',
+                         incremental: bool = False,
+                         low_memory: bool = False,
+                         clusters: bool = False,
+                         prefilter: bool = PREFILTER,
+                         output_format: str = OUTPUT_FORMAT,
+                         diff_top_k: int = DIFF_TOP_K,
+                         metrics: Optional[RequestMetrics] = None):
+    metrics = metrics or RequestMetrics('deduplication')
     try:
         delimiter = delimiter.replace("\\t", "\t").strip()
         try:
@@ -40,112 +236,264 @@ def calculate_similarity(data_source, is_raw_data: bool, excel_sheet_name: str,
 
         cols: list[str] = columns.split(delimiter)
 
-        if is_raw_data:
-            data_loader = QtestExcelDataLoader(data_source.name, ['Precondition', 'Test Step Description',
-                                                                  'Test Step Expected Result'],
-                                               sheet_name=excel_sheet_name, test_case_id_column_name=idcol)
-            initial_data: DataFrame = data_loader.create_prepared_data_frame_from_excel_file()
-        else:
-            if data_source.name.__contains__('csv'):
-                initial_data: DataFrame = pd.read_csv(data_source.name, encoding=encoding)
-            else:
-                initial_data: DataFrame = pd.read_excel(data_source.name, sheet_name=excel_sheet_name)
-                initial_data.fillna("", inplace=True)
+        (initial_data, prepared_data_list) = load_and_clean(data_source.name, is_raw_data, excel_sheet_name, encoding,
+                                                            idcol, cols, low_memory, metrics)
+        metrics.count('rows', len(initial_data))
 
-        prepared_data_list: list[str] = clean_data_frame(initial_data, cols)
+        model: ModelRegistry = model_registry
+        with metrics.stage('model'):
+            model.get()
+        incremental = incremental and not test_steps
+        clusters = clusters and not test_steps
+        prefilter = prefilter and not test_steps and not incremental
 
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2',
-                                    device='cpu', cache_folder="./models_cache")
+        texts_to_encode: list[str] = prepared_data_list
+        if prefilter:
+            # Exact and near-exact copies are collapsed, only their representatives are embedded and compared
+            with metrics.stage('prefilter'):
+                (representative_positions, copies, copy_representatives, copy_scores, exact_copies) = \
+                    prefilter_texts(prepared_data_list, cutoff)
+                texts_to_encode = [prepared_data_list[position] for position in representative_positions.tolist()]
+            metrics.count('collapsed_copies', len(copies))
 
-        # Compute embeddings
-        embeddings: Tensor = model.encode(prepared_data_list, convert_to_tensor=True)
-        if not test_steps:
-            cosine_scores: Tensor = util.cos_sim(embeddings, embeddings)
+        if incremental:
+            cache_stats: dict = {'hits': 0, 'misses': 0}
         else:
-            steps_embeddings: Tensor = model.encode([cleanse_document(test_steps, cols)], convert_to_tensor=True)
-            cosine_scores = util.semantic_search(steps_embeddings, embeddings, score_function=util.dot_score, top_k=5)
-        result_data_frame = DataFrame()
+            # Compute embeddings, only the texts missing in the cache are sent to the model
+            with metrics.stage('encode'):
+                (embeddings, cache_stats) = embedding_cache.encode(model, model.model_key, texts_to_encode)
+                if not test_steps:
+                    # Only the copy in the precision of the similarity stage is kept
+                    embeddings = compress_embeddings(embeddings)[0]
+        if test_steps:
+            with metrics.stage('search'):
+                steps_embeddings: Tensor = model.encode([cleanse_document(test_steps, cols)], convert_to_tensor=True)
+                metrics.count_encoded(1)
+                cosine_scores = search(steps_embeddings, embeddings, top_k=5)
         if not test_steps:
-            for (index, scores) in enumerate(cosine_scores):
-                for (jindex, score) in enumerate(scores):
-                    if score > cutoff and index < jindex:
-                        record = {
-                            f'{idcol} #1': initial_data.at[index, idcol],
-                            f'{idcol} #2': initial_data.at[jindex, idcol],
-                            'Score': round(score.item(), 3)
-                        }
-                        composite_score = 0
-                        for col in cols:
-                            data_at_index: str = cleanse_document({col: initial_data.at[index, col]}, [col])
-                            composite_score += util.cos_sim(
-                                model.encode([data_at_index]),
-                                model.encode([cleanse_document({col: initial_data.at[jindex, col]}, [col])])
-                            )
-                        composite_score /= len(cols)
-                        record['Composite Score'] = round(composite_score.item(), 3)
-                        for col in initial_data.columns:
-                            if col != idcol:
-                                if col in cols:
-                                    (col1, col2) = equalize(initial_data.at[index, col], initial_data.at[jindex, col])
-                                    record[f'{col} #1'] = col1
-                                    record[f'{col} #2'] = col2
-                                else:
-                                    record[f'{col} #1'] = initial_data.at[index, col]
-                                    record[f'{col} #2'] = initial_data.at[jindex, col]
-                        result_data_frame = result_data_frame._append(record, ignore_index=True)
+            if incremental:
+                # Encoding of the new rows and the composite scores of the new pairs are a part of the stage
+                with metrics.stage('incremental'):
+                    (rows, jrows, scores, pair_composite_scores) = find_pairs_incrementally(
+                        model, initial_data, idcol, cols, prepared_data_list, cutoff, cache_stats)
+            else:
+                with metrics.stage('similarity'):
+                    (rows, jrows, scores) = find_pairs(embeddings, cutoff)
+                    if prefilter:
+                        # Clusters need only the copies connected, the pairs need all the pairs of the copies
+                        (rows, jrows, scores) = expand_prefiltered_pairs(rows, jrows, scores, representative_positions,
+                                                                         copies, copy_representatives, copy_scores,
+                                                                         exact_copies, not clusters)
+                if not clusters:
+                    with metrics.stage('composite'):
+                        pair_composite_scores: Tensor = encode_composite_scores(model, initial_data, cols, rows,
+                                                                                jrows, cache_stats)
+            if clusters:
+                # Members are compared only with the representative of their cluster, so the scores, the composite
+                # scores and the diffs are calculated once per member instead of once per pair
+                with metrics.stage('clusters'):
+                    (cluster_numbers, representatives, members) = cluster_pairs(
+                        rows.cpu().numpy(), jrows.cpu().numpy(), scores.cpu().numpy())
+                    (representatives_tensor, members_tensor) = (torch.from_numpy(representatives),
+                                                                torch.from_numpy(members))
+                    # Embeddings of all the rows are at hand unless the rows were collapsed or embedded incrementally
+                    member_scores: Tensor = encode_pair_scores(
+                        model, prepared_data_list, representatives_tensor, members_tensor, cache_stats,
+                        None if incremental or prefilter else embeddings)
+                    member_composite_scores: Tensor = encode_composite_scores(
+                        model, initial_data, cols, representatives_tensor, members_tensor, cache_stats)
+                metrics.count('clusters', len(set(cluster_numbers.tolist())))
+                with metrics.stage('diff'):
+                    result_data_frame = build_clusters_data_frame(initial_data, idcol, cols, cluster_numbers,
+                                                                  representatives, members,
+                                                                  member_scores.numpy(),
+                                                                  member_composite_scores.cpu().numpy(), diff_top_k)
+            else:
+                with metrics.stage('diff'):
+                    result_data_frame = build_pairs_data_frame(initial_data, idcol, cols, rows.cpu().numpy(),
+                                                               jrows.cpu().numpy(), scores.cpu().numpy(),
+                                                               pair_composite_scores.cpu().numpy(), diff_top_k)
         else:
-            for issues in cosine_scores:
-                for issue in issues:
-                    if issue['score'] >= cutoff:
-                        record = {'Score': round(issue['score'], 3)}
-                        for col in initial_data[issue['corpus_id']].keys():
-                            if col in cols:
-                                (col1, col2) = equalize(test_steps[col], initial_data.at[issue['corpus_id'], col])
-                                record[f'{col} #1'] = col1
-                                record[f'{col} #2'] = col2
-                            else:
-                                record[f'{col} #1'] = test_steps.get(col, '')
-                                record[f'{col} #2'] = initial_data.at[issue['corpus_id'], col]
-                        result_data_frame = result_data_frame._append(record, ignore_index=True)
-        out_path = path.join(tempfile.gettempdir(), "duplicates.xlsx")
-        if result_data_frame.empty is False:
+            with metrics.stage('diff'):
+                record_builder = RecordBuilder()
+                for issues in cosine_scores:
+                    append_query_records(record_builder, test_steps, issues, initial_data, cols, cutoff)
+                result_data_frame = record_builder.build()
+        metrics.count('pairs', len(result_data_frame))
+        metrics.count_cache(cache_stats)
+        with metrics.stage('export'):
             if test_steps:
-                result_data_frame.sort_values('Score', ascending=False, inplace=True)
+                out_path: Optional[str] = write_result(result_data_frame, ['Score'], [False], "duplicates",
+                                                       output_format)
+            elif clusters:
+                out_path: Optional[str] = write_result(result_data_frame, ['Cluster', 'Score'], [True, False],
+                                                       "duplicates", output_format)
             else:
-                result_data_frame.sort_values(['Score', 'Composite Score'], ascending=[False, False], inplace=True)
-            clean_special_characters_from_data_frame(result_data_frame)
-            result_data_frame.to_excel(out_path, sheet_name='Deduplication Result', index=False)
+                out_path: Optional[str] = write_result(result_data_frame, ['Score', 'Composite Score'],
+                                                       [False, False], "duplicates", output_format)
+        if clusters:
+            message: str = (f'Identified {metrics.counts["clusters"]} clusters of '
+                            f'{len(result_data_frame) + metrics.counts["clusters"]} potential duplicates')
         else:
-            out_path = None
-        return [f'Identified {len(result_data_frame)} pairs of potential duplicates', out_path]
+            message: str = f'Identified {len(result_data_frame)} pairs of potential duplicates'
+        if embedding_cache.enabled:
+            message += f'\nEmbedding cache: {cache_stats["hits"]} hits, {cache_stats["misses"]} misses'
+        if not test_steps and not incremental and SIMILARITY_BACKEND == 'ivf' and ANN_RECALL_REPORT:
+            message += f'\nApproximate search recall against exact search: {recall_against_exact(embeddings, cutoff)}'
+        metrics.finish()
+        return [f'{message}\n{metrics.summary()}', out_path]
+    except Exception as e:
+        metrics.fail()
+        metrics.finish()
+        return [f'Error: {format_exc()}', None]
+
+
+# Function to look up many test cases at once: the corpus is embedded once, the queries are encoded in one batch
+# and searched with a single batched semantic search, and all the matches are written into one file
+def query_similarity_batch(data_source, is_raw_data: bool, excel_sheet_name: str, encoding: str, delimiter: str,
+                           idcol: str, columns: str, queries_source,
+                           cutoff: float = 0.8,
+                           top_k: int = 5,
+                           low_memory: bool = False,
+                           output_format: str = OUTPUT_FORMAT):
+    metrics: RequestMetrics = RequestMetrics('batch_query')
+    try:
+        delimiter = delimiter.replace("\\t", "\t").strip()
+        cols: list[str] = columns.split(delimiter)
+        with open(queries_source.name, encoding='utf-8') as queries_file:
+            test_cases: list[dict] = [loads(line) for line in queries_file if line.strip()]
+        metrics.count('queries', len(test_cases))
+
+        (initial_data, prepared_data_list) = load_and_clean(data_source.name, is_raw_data, excel_sheet_name, encoding,
+                                                            idcol, cols, low_memory, metrics)
+        metrics.count('rows', len(initial_data))
+        model: ModelRegistry = model_registry
+        with metrics.stage('model'):
+            model.get()
+        with metrics.stage('encode'):
+            (embeddings, cache_stats) = embedding_cache.encode(model, model.model_key, prepared_data_list)
+            queries_embeddings: Tensor = model.encode([cleanse_document(test_case, cols) for test_case in test_cases],
+                                                      convert_to_tensor=True)
+            metrics.count_encoded(len(test_cases))
+        with metrics.stage('search'):
+            search_results: list[list[dict]] = search(queries_embeddings, embeddings, top_k=int(top_k))
+
+        with metrics.stage('diff'):
+            record_builder = RecordBuilder()
+            for (query_no, (test_case, issues)) in enumerate(zip(test_cases, search_results), start=1):
+                append_query_records(record_builder, test_case, issues, initial_data, cols, cutoff, query_no)
+            result_data_frame: DataFrame = record_builder.build()
+        metrics.count('pairs', len(result_data_frame))
+        metrics.count_cache(cache_stats)
+        with metrics.stage('export'):
+            out_path: Optional[str] = write_result(result_data_frame, ['Query #', 'Score'], [True, False],
+                                                   "query_results", output_format)
+
+        message: str = (f'Identified {len(result_data_frame)} potential duplicates for '
+                        f'{result_data_frame["Query #"].nunique() if len(result_data_frame) else 0} '
+                        f'of {len(test_cases)} test cases')
+        if embedding_cache.enabled:
+            message += f'\nEmbedding cache: {cache_stats["hits"]} hits, {cache_stats["misses"]} misses'
+        metrics.finish()
+        return [f'{message}\n{metrics.summary()}', out_path]
     except Exception as e:
+        metrics.fail()
+        metrics.finish()
         return [f'Error: {format_exc()}', None]
 
 
+# Inputs describing the document with test cases, shared by the deduplication and the batch query
+def create_data_source_inputs() -> list:
+    return [
+        gr.components.File(label="Test cases is csv or xlsx or xls format", type="file",
+                           file_types=['csv', 'xlsx', 'xls']),
+        gr.components.Checkbox(label="Indicate that raw data will be using", value=False,
+                               info='Used only for unprepared data sheets in excel imported from qTest'),
+        gr.components.Textbox(lines=1,
+                              label="Excel sheet name for deduplication from excel document",
+                              info='Required when you do deduplication based on xlsx file'),
+        gr.components.Dropdown(["utf-8", "utf-8-sig", "latin-1", "cp1252"], value='utf-8', label="Encoding",
+                               info="Encoding of your file may be very different from UTF-8. For csv only"),
+        gr.components.Textbox(lines=1, value=',', label="Columns delimiter"),
+        gr.components.Textbox(lines=1, label="Column name with entity ID"),
+        gr.components.Textbox(lines=1,
+                              label="Delimiter separated list of columns to be used for duplicates detection"),
+    ]
+
+
+def create_low_memory_input() -> gr.components.Checkbox:
+    return gr.components.Checkbox(label="Low memory loading", value=False,
+                                  info='Read only the ID column and the columns used for duplicates detection, '
+                                       'other columns are not included into the result')
+
+
+def create_output_format_input() -> gr.components.Dropdown:
+    return gr.components.Dropdown(list(OUTPUT_FORMATS), value=OUTPUT_FORMAT, label="Result format",
+                                  info='csv and parquet are written much faster than xlsx for large results')
+
+
 def main():
     iface = gr.Interface(
         fn=calculate_similarity, inputs=[
-            gr.components.File(label="Test cases is csv or xlsx or xls format", type="file",
-                               file_types=['csv', 'xlsx', 'xls']),
-            gr.components.Checkbox(label="Indicate that raw data will be using", value=False,
-                                   info='Used only for unprepared data sheets in excel imported from qTest'),
-            gr.components.Textbox(lines=1,
-                                  label="Excel sheet name for deduplication from excel document",
-                                  info='Required when you do deduplication based on xlsx file'),
-            gr.components.Dropdown(["utf-8", "utf-8-sig", "latin-1", "cp1252"], value='utf-8', label="Encoding",
-                                   info="Encoding of your file may be very different from UTF-8. For csv only"),
-            gr.components.Textbox(lines=1, value=',', label="Columns delimiter"),
-            gr.components.Textbox(lines=1, label="Column name with entity ID"),
-            gr.components.Textbox(lines=1,
-                                  label="Delimiter separated list of columns to be used for duplicates detection"),
+            *create_data_source_inputs(),
             gr.components.Slider(0, 1, value=0.8, step=0.01, label="Cut-off score"),
             gr.components.Textbox(lines=5, label="Test case for deduplication"),
+            gr.components.Checkbox(label="Incremental deduplication", value=False,
+                                   info='Compare only new and changed rows against the test cases persisted '
+                                        'by the previous runs with the same ID column and columns'),
+            create_low_memory_input(),
+            gr.components.Checkbox(label="Group duplicates into clusters", value=False,
+                                   info='Every group of connected duplicates is reported as one cluster, '
+                                        'where each member is compared only with the representative of the cluster'),
+            gr.components.Checkbox(label="Collapse exact and near-exact copies", value=PREFILTER,
+                                   info='Identical and trivially edited texts are reported as copies of the first '
+                                        'of them, and only the first ones are embedded and compared'),
+            create_output_format_input(),
         ],
         outputs=[
             "text",
-            gr.components.File(label="Generated file with duplicates", type="file", file_types=['xlsx']),
+            gr.components.File(label="Generated file with duplicates", type="file", file_types=list(OUTPUT_FORMATS)),
         ], title="Deduplication of entities")
-    iface.launch(share=False, server_name="0.0.0.0", server_port=environ.get("DEDUPE_PORT", 8899))
+    batch_iface = gr.Interface(
+        fn=query_similarity_batch, inputs=[
+            *create_data_source_inputs(),
+            gr.components.File(label="Test cases to look up, one JSON object per line", type="file",
+                               file_types=['.jsonl', '.json', '.txt']),
+            gr.components.Slider(0, 1, value=0.8, step=0.01, label="Cut-off score"),
+            gr.components.Number(value=5, precision=0, label="Number of the most similar test cases per query"),
+            create_low_memory_input(),
+            create_output_format_input(),
+        ],
+        outputs=[
+            "text",
+            gr.components.File(label="Generated file with duplicates", type="file", file_types=list(OUTPUT_FORMATS)),
+        ], title="Batch lookup of test cases")
+    tabs = gr.TabbedInterface([iface, batch_iface], ["Deduplication", "Batch query"])
+    if PRELOAD_MODEL:
+        model_registry.load_in_background()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    app = FastAPI()
+
+    @app.get('/health/live')
+    def live():
+        return {'status': 'alive'}
+
+    # Load balancer should route the traffic only after the model is loaded and warmed up. Without the preloading
+    # the model is loaded by the first request, so the service is ready right away
+    @app.get('/health/ready')
+    def ready():
+        if model_registry.is_ready() or not PRELOAD_MODEL:
+            return {'status': 'ready', 'model': model_registry.model_name, 'loaded': model_registry.is_ready()}
+        return JSONResponse(status_code=503, content={'status': 'loading', 'model': model_registry.model_name})
+
+    # Durations of the requests and their stages along with the processed counts for Prometheus
+    @app.get('/metrics', response_class=PlainTextResponse)
+    def metrics():
+        return metrics_registry.render()
+
+    app = gr.mount_gradio_app(app, tabs, path='/')
+    uvicorn.run(app, host="0.0.0.0", port=int(environ.get("DEDUPE_PORT", 8899)))
 
 
 if __name__ == '__main__':
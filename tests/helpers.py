@@ -0,0 +1,56 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import zlib
+
+import torch
+from torch.nn.functional import normalize
+
+CUTOFF = 0.8
+
+
+# Groups of similar embeddings, so there are pairs above the cut-off within every group and none across them
+def create_embeddings(length: int = 53, dimension: int = 16, no_of_groups: int = 7,
+                      noise_scale: float = 0.3) -> torch.Tensor:
+    generator: torch.Generator = torch.Generator().manual_seed(0)
+    centers: torch.Tensor = torch.randn(no_of_groups, dimension, generator=generator)
+    noise: torch.Tensor = torch.randn(length, dimension, generator=generator)
+    return centers[torch.arange(length) % no_of_groups] + noise_scale * noise
+
+
+# Pairs above the cut-off of the dense scores matrix, the reference for the tiled search
+def dense_pairs(embeddings: torch.Tensor, cutoff: float, start: int = 0) -> dict[tuple[int, int], float]:
+    normalized: torch.Tensor = normalize(embeddings, dim=1)
+    cos_sim: torch.Tensor = normalized @ normalized.T
+    mask: torch.Tensor = torch.triu(cos_sim > cutoff, diagonal=1)
+    mask[:, :start] = False
+    (rows, cols) = torch.nonzero(mask, as_tuple=True)
+    return {(row, col): score for (row, col, score) in zip(rows.tolist(), cols.tolist(), cos_sim[rows, cols].tolist())}
+
+
+# Model encoding the texts starting with the same letter into similar embeddings, records the texts of every call
+class FakeModel:
+    model_key = 'fake-model'
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts: list[str], convert_to_tensor: bool = False, **kwargs):
+        self.calls.append(list(texts))
+        embeddings: torch.Tensor = torch.zeros(len(texts), 27)
+        for (position, text) in enumerate(texts):
+            letter: str = text[:1].lower()
+            embeddings[position, ord(letter) - ord('a') if 'a' <= letter <= 'z' else 26] = 1.0
+            generator: torch.Generator = torch.Generator().manual_seed(zlib.crc32(text.encode('utf-8')))
+            embeddings[position] += 0.2 * torch.rand(27, generator=generator)
+        return embeddings if convert_to_tensor else embeddings.numpy()
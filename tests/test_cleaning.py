@@ -0,0 +1,60 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import random
+import re
+import string
+
+import pandas as pd
+
+from utils.cleaning import clean_data_frame, clean_texts, cleanse_document, custom_kw
+
+
+# Cleaning of a single document as it was done before the shared cleaning engine
+def reference_clean(document: str) -> str:
+    document = re.sub(r"\d+", " ", document)
+    document = " ".join([w for w in document.split() if len(w) > 1])
+    document = "".join([char.lower() for char in document if char not in string.punctuation])
+    document = re.sub(r"\W+", " ", document)
+    for kw in custom_kw:
+        document = document.replace(kw, "")
+    return document
+
+
+def create_documents(no_of_documents: int = 2000) -> list[str]:
+    randomizer: random.Random = random.Random(0)
+    alphabet: list[str] = list(string.ascii_letters + string.digits + string.punctuation + ' \n\tßéİ_') + \
+        custom_kw + ['verchangeify']
+    return [''.join(randomizer.choice(alphabet) for _ in range(randomizer.randint(0, 60)))
+            for _ in range(no_of_documents)]
+
+
+def test_clean_texts_match_reference():
+    documents: list[str] = [document.lower() for document in create_documents()]
+    assert clean_texts(documents) == [reference_clean(document) for document in documents]
+
+
+def test_clean_data_frame_matches_reference():
+    # More documents than a chunk of a worker process, so the documents are cleaned by the workers as well
+    documents: list[str] = create_documents(2500)
+    data_frame: pd.DataFrame = pd.DataFrame({'Name': documents, 'Steps': documents[::-1], 'Id': range(len(documents))})
+    expected: list[str] = [reference_clean(f'{name}\n{steps}'.lower())
+                           for (name, steps) in zip(data_frame['Name'], data_frame['Steps'])]
+    assert clean_data_frame(data_frame, ['Name', 'Steps']) == expected
+    assert clean_data_frame(data_frame, ['Name', 'Steps'], workers=2) == expected
+
+
+def test_cleanse_document_matches_reference():
+    for (name, steps) in zip(create_documents(200), create_documents(200)[::-1]):
+        assert cleanse_document({'Name': name, 'Steps': steps}, ['Name', ' Steps']) == \
+            reference_clean(f'{name.lower()}\n{steps.lower()}')
@@ -0,0 +1,51 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import numpy as np
+import torch
+
+from tests.helpers import CUTOFF, create_embeddings, dense_pairs
+from utils.clustering import UnionFind, cluster_pairs
+from utils.similarity import extract_pairs_tiled
+
+
+def test_clusters_are_numbered_by_size_and_represented_by_most_central_item():
+    rows: np.ndarray = np.array([10, 11, 15, 13])
+    jrows: np.ndarray = np.array([11, 12, 16, 14])
+    scores: np.ndarray = np.array([0.9, 0.85, 0.95, 0.82], dtype=np.float32)
+    (clusters, representatives, members) = cluster_pairs(rows, jrows, scores)
+    assert clusters.tolist() == [1, 1, 2, 3]
+    assert representatives.tolist() == [11, 11, 13, 15]
+    assert members.tolist() == [10, 12, 14, 16]
+
+
+def test_clusters_match_connected_components_of_dense_scores():
+    # More noise than in the search checks, so the groups split into several clusters
+    embeddings: torch.Tensor = create_embeddings(noise_scale=0.4)
+    (rows, cols, scores) = extract_pairs_tiled(embeddings, CUTOFF, tile_size=10, dtype='float32')
+    (clusters, representatives, members) = cluster_pairs(rows.numpy(), cols.numpy(), scores.numpy())
+
+    union_find: UnionFind = UnionFind(len(embeddings))
+    for (row, col) in dense_pairs(embeddings, CUTOFF):
+        union_find.union(row, col)
+    components: dict[int, set[int]] = {}
+    for item in range(len(embeddings)):
+        components.setdefault(union_find.find(item), set()).add(item)
+    expected: set[frozenset] = {frozenset(component) for component in components.values() if len(component) > 1}
+
+    found: dict[int, set[int]] = {}
+    for (cluster, representative, member) in zip(clusters.tolist(), representatives.tolist(), members.tolist()):
+        found.setdefault(cluster, {representative}).add(member)
+    assert {frozenset(cluster) for cluster in found.values()} == expected
+    sizes: list[int] = [len(found[cluster]) for cluster in sorted(found)]
+    assert sizes == sorted(sizes, reverse=True)
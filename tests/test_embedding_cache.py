@@ -0,0 +1,73 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from tests.helpers import FakeModel
+from utils.embedding_cache import EmbeddingCache
+
+# Size of an embedding of the fake model in bytes
+VECTOR_SIZE = 27 * 4
+
+
+def cached_size(cache: EmbeddingCache) -> int:
+    with sqlite3.connect(cache.cache_path) as connection:
+        return connection.execute('SELECT COALESCE(SUM(size), 0) FROM embeddings').fetchone()[0]
+
+
+def test_only_cache_misses_are_encoded(tmp_path):
+    (model, cache) = (FakeModel(), EmbeddingCache(str(tmp_path / 'embeddings.sqlite'), max_size_mb=1))
+    (embeddings, stats) = cache.encode(model, model.model_key, ['alpha', 'beta', 'alpha'])
+    assert model.calls == [['alpha', 'beta']]
+    assert stats == {'hits': 0, 'misses': 2}
+    assert torch.allclose(embeddings, FakeModel().encode(['alpha', 'beta', 'alpha'], convert_to_tensor=True))
+
+    (embeddings, stats) = cache.encode(model, model.model_key, ['gamma', 'alpha'])
+    assert model.calls[-1] == ['gamma']
+    assert stats == {'hits': 1, 'misses': 1}
+    assert torch.allclose(embeddings, FakeModel().encode(['gamma', 'alpha'], convert_to_tensor=True))
+
+    # Embeddings of another model are cached separately
+    cache.encode(model, 'another-model', ['alpha'])
+    assert model.calls[-1] == ['alpha']
+
+
+def test_least_recently_used_embeddings_are_evicted(tmp_path):
+    (model, cache) = (FakeModel(), EmbeddingCache(str(tmp_path / 'embeddings.sqlite'), max_size_mb=1))
+    cache.max_size_bytes = 3 * VECTOR_SIZE
+    cache.encode(model, model.model_key, ['alpha', 'beta', 'gamma'])
+    time.sleep(0.01)
+    cache.encode(model, model.model_key, ['alpha'])
+    time.sleep(0.01)
+    cache.encode(model, model.model_key, ['delta'])
+    assert cached_size(cache) <= cache.max_size_bytes
+
+    model.calls.clear()
+    (_, stats) = cache.encode(model, model.model_key, ['alpha', 'delta'])
+    assert model.calls == []
+    assert stats == {'hits': 2, 'misses': 0}
+
+
+def test_concurrent_encoding(tmp_path):
+    (model, cache) = (FakeModel(), EmbeddingCache(str(tmp_path / 'embeddings.sqlite'), max_size_mb=1))
+    batches: list[list[str]] = [[f'text {(batch + index) % 40}' for index in range(20)] for batch in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results: list[torch.Tensor] = [embeddings for (embeddings, _) in executor.map(
+            lambda texts: cache.encode(model, model.model_key, texts), batches)]
+    for (texts, embeddings) in zip(batches, results):
+        assert torch.allclose(embeddings, FakeModel().encode(texts, convert_to_tensor=True))
+    assert cached_size(cache) == 40 * VECTOR_SIZE
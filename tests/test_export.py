@@ -0,0 +1,78 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from pandas import DataFrame
+
+from utils.export import OUTPUT_FORMATS, SHEET_NAME, export_result, write_excel
+
+
+# Result with the columns filled with the empty strings of the blank cells, like the loaded documents
+def create_mixed_data_frame() -> DataFrame:
+    return DataFrame({
+        'Id #1': [1, 2],
+        'Id #2': [3, 4],
+        'Score': [0.95, 0.9],
+        'Priority #1': [1, 'High'],
+        'Priority #2': ['', 2.5],
+        'Name #1': ['Login_x0009_page', None],
+        'Name #2': ['Login page', 'Logout']
+    })
+
+
+def read_result(output_path: str, output_format: str) -> DataFrame:
+    if output_format == 'xlsx':
+        return pd.read_excel(output_path, keep_default_na=False)
+    if output_format == 'csv':
+        return pd.read_csv(output_path, keep_default_na=False)
+    return pd.read_parquet(output_path)
+
+
+@pytest.mark.parametrize('output_format', OUTPUT_FORMATS)
+def test_mixed_type_columns_are_exported(output_format: str, tmp_path):
+    output_path: str = export_result(create_mixed_data_frame(), 'duplicates', output_format, str(tmp_path))
+    assert output_path.endswith(f'duplicates.{output_format}')
+
+    result: DataFrame = read_result(output_path, output_format)
+    assert list(result.columns) == list(create_mixed_data_frame().columns)
+    assert result['Id #1'].tolist() == [1, 2]
+    assert result['Score'].tolist() == pytest.approx([0.95, 0.9])
+    assert [str(value) for value in result['Priority #1']] == ['1', 'High']
+    assert result['Name #1'].tolist()[0] == 'Login\tpage'
+    assert result['Name #2'].tolist() == ['Login page', 'Logout']
+
+
+def test_rows_above_limit_are_continued_on_next_sheets(tmp_path):
+    data_frame: DataFrame = DataFrame({'Id': range(5), 'Name': [f'Test case {index}' for index in range(5)]})
+    output_path: str = str(tmp_path / 'duplicates.xlsx')
+    # Every sheet holds the header and two rows
+    write_excel(data_frame, output_path, max_rows=3)
+
+    workbook = load_workbook(output_path, read_only=True)
+    assert workbook.sheetnames == [SHEET_NAME, f'{SHEET_NAME} 2', f'{SHEET_NAME} 3']
+    rows: list[tuple] = [row for sheet in workbook for row in sheet.iter_rows(values_only=True)]
+    workbook.close()
+    assert rows == [('Id', 'Name'), (0, 'Test case 0'), (1, 'Test case 1'),
+                    ('Id', 'Name'), (2, 'Test case 2'), (3, 'Test case 3'),
+                    ('Id', 'Name'), (4, 'Test case 4')]
+
+
+def test_empty_result_has_header_only(tmp_path):
+    output_path: str = str(tmp_path / 'duplicates.xlsx')
+    write_excel(DataFrame(columns=['Id', 'Name']), output_path, max_rows=3)
+    workbook = load_workbook(output_path, read_only=True)
+    assert workbook.sheetnames == [SHEET_NAME]
+    assert list(workbook[SHEET_NAME].iter_rows(values_only=True)) == [('Id', 'Name')]
+    workbook.close()
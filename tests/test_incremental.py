@@ -0,0 +1,130 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import json
+from os import path
+
+import pandas as pd
+import pytest
+from pandas import DataFrame
+
+import deduplicate
+from tests.helpers import FakeModel
+from utils.corpus import PersistedCorpus
+from utils.embedding_cache import EmbeddingCache
+from utils.similarity import extract_pairs_tiled
+
+TEXTS = {'A1': 'alpha one', 'A2': 'alpha two', 'B1': 'beta one', 'B2': 'beta two'}
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_cache(monkeypatch):
+    monkeypatch.setattr(deduplicate, 'embedding_cache', EmbeddingCache(max_size_mb=0))
+
+
+# Start of the rows searched by every incremental run
+@pytest.fixture
+def search_starts(monkeypatch) -> list[int]:
+    starts: list[int] = []
+
+    def extract_pairs_spy(embeddings, cutoff, **kwargs):
+        starts.append(kwargs.get('start', 0))
+        return extract_pairs_tiled(embeddings, cutoff, **kwargs)
+
+    monkeypatch.setattr(deduplicate, 'extract_pairs_tiled', extract_pairs_spy)
+    return starts
+
+
+def run_incrementally(model: FakeModel, texts: dict[str, str], cutoff: float, corpus_path) -> set[frozenset]:
+    data_frame: DataFrame = DataFrame({'Id': list(texts), 'Name': list(texts.values())})
+    (rows, jrows, _, _) = deduplicate.find_pairs_incrementally(model, data_frame, 'Id', ['Name'], list(texts.values()),
+                                                                cutoff, {'hits': 0, 'misses': 0}, str(corpus_path))
+    ids: list[str] = list(texts)
+    return {frozenset((ids[row], ids[jrow])) for (row, jrow) in zip(rows.tolist(), jrows.tolist())}
+
+
+def load_corpus(corpus_path) -> PersistedCorpus:
+    return PersistedCorpus(FakeModel.model_key, 'Id', ['Name'], str(corpus_path)).load()
+
+
+def test_edited_and_deleted_ids_are_invalidated_with_their_pairs(tmp_path):
+    model: FakeModel = FakeModel()
+    assert run_incrementally(model, TEXTS, 0.8, tmp_path) == {frozenset(('A1', 'A2')), frozenset(('B1', 'B2'))}
+
+    model.calls.clear()
+    texts: dict[str, str] = {'A1': 'alpha one', 'A2': 'beta three', 'B1': 'beta one'}
+    assert run_incrementally(model, texts, 0.8, tmp_path) == {frozenset(('A2', 'B1'))}
+    # Only the edited row is embedded again
+    assert model.calls[0] == ['beta three']
+
+    corpus: PersistedCorpus = load_corpus(tmp_path)
+    assert sorted(corpus.items['id']) == ['A1', 'A2', 'B1']
+    assert len(corpus.embeddings) == 3
+    assert {frozenset(pair) for pair in zip(corpus.pairs['id_1'], corpus.pairs['id_2'])} == {frozenset(('A2', 'B1'))}
+
+
+def test_only_new_rows_are_searched(tmp_path, search_starts: list[int]):
+    model: FakeModel = FakeModel()
+    run_incrementally(model, TEXTS, 0.8, tmp_path)
+
+    model.calls.clear()
+    pairs: set[frozenset] = run_incrementally(model, {**TEXTS, 'A3': 'alpha three'}, 0.8, tmp_path)
+    assert search_starts == [0, 4]
+    assert model.calls[0] == ['alpha three']
+    assert pairs == {frozenset(('A1', 'A2')), frozenset(('B1', 'B2')), frozenset(('A1', 'A3')),
+                     frozenset(('A2', 'A3'))}
+
+
+def test_lower_cutoff_recomputes_known_pairs(tmp_path, search_starts: list[int]):
+    model: FakeModel = FakeModel()
+    high_cutoff_pairs: set[frozenset] = run_incrementally(model, TEXTS, 0.9, tmp_path)
+    low_cutoff_pairs: set[frozenset] = run_incrementally(model, TEXTS, 0.2, tmp_path)
+    assert search_starts == [0, 0]
+    assert load_corpus(tmp_path).cutoff == 0.2
+    assert low_cutoff_pairs == run_incrementally(FakeModel(), TEXTS, 0.2, tmp_path / 'reference')
+    assert high_cutoff_pairs < low_cutoff_pairs
+
+    # Known pairs are complete for the higher cut-off, so they are filtered instead of being looked for again
+    assert run_incrementally(model, TEXTS, 0.9, tmp_path) == high_cutoff_pairs
+    assert search_starts[-1] == len(TEXTS)
+
+
+def test_corpus_not_matching_manifest_is_rebuilt(tmp_path, search_starts: list[int]):
+    model: FakeModel = FakeModel()
+    pairs: set[frozenset] = run_incrementally(model, TEXTS, 0.8, tmp_path)
+
+    corpus: PersistedCorpus = load_corpus(tmp_path)
+    with open(path.join(corpus.directory, 'current'), encoding='utf-8') as pointer_file:
+        manifest_path: str = path.join(corpus.directory, pointer_file.read().strip(), 'manifest.json')
+    with open(manifest_path, encoding='utf-8') as manifest_file:
+        manifest: dict = json.load(manifest_file)
+    manifest['items'] += 1
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+    assert len(load_corpus(tmp_path)) == 0
+
+    model.calls.clear()
+    assert run_incrementally(model, TEXTS, 0.8, tmp_path) == pairs
+    assert search_starts == [0, 0]
+    assert model.calls[0] == list(TEXTS.values())
+    assert len(load_corpus(tmp_path)) == len(TEXTS)
+
+
+def test_corpus_is_stored_without_pickles(tmp_path):
+    run_incrementally(FakeModel(), TEXTS, 0.8, tmp_path)
+    corpus: PersistedCorpus = load_corpus(tmp_path)
+    with open(path.join(corpus.directory, 'current'), encoding='utf-8') as pointer_file:
+        version_directory: str = path.join(corpus.directory, pointer_file.read().strip())
+    items: DataFrame = pd.read_csv(path.join(version_directory, 'items.csv'), dtype=str)
+    assert items['id'].tolist() == list(TEXTS)
+    assert corpus.items['text'].tolist() == list(TEXTS.values())
@@ -0,0 +1,67 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import pytest
+import torch
+
+from utils.prefilter import expand_prefiltered_pairs, prefilter_texts
+
+TEXT = ' '.join(f'word{index}' for index in range(40))
+# The last shingle differs, so the Jaccard similarity of the shingles is 37 / 39, about 0.949
+EDITED_TEXT = ' '.join(f'word{index}' for index in range(39)) + ' edited'
+OTHER_TEXT = 'unrelated text of another test case'
+NO_PAIRS: tuple = (torch.zeros(0, dtype=torch.long), torch.zeros(0, dtype=torch.long), torch.zeros(0))
+
+
+def as_pairs(rows: torch.Tensor, jrows: torch.Tensor, scores: torch.Tensor) -> dict[tuple[int, int], float]:
+    return {(row, jrow): score for (row, jrow, score) in zip(rows.tolist(), jrows.tolist(), scores.tolist())}
+
+
+def test_exact_and_near_exact_copies_are_collapsed():
+    (representatives, members, member_representatives, member_scores, exact) = prefilter_texts(
+        [TEXT, OTHER_TEXT, TEXT, EDITED_TEXT, EDITED_TEXT], 0.8, min_jaccard=0.9)
+    assert representatives.tolist() == [0, 1]
+    assert members.tolist() == [2, 3, 4]
+    # The exact copy of the near-exact copy is assigned to the first occurrence of its text
+    assert member_representatives.tolist() == [0, 0, 3]
+    assert member_scores.tolist() == pytest.approx([1.0, 37 / 39, 1.0])
+    assert exact.tolist() == [True, False, True]
+
+
+def test_near_exact_copies_not_above_cutoff_are_embedded():
+    (representatives, members, member_representatives, member_scores, exact) = prefilter_texts(
+        [TEXT, EDITED_TEXT, TEXT], 0.95, min_jaccard=0.9)
+    assert representatives.tolist() == [0, 1]
+    assert members.tolist() == [2]
+    assert member_representatives.tolist() == [0]
+    assert member_scores.tolist() == [1.0]
+    assert exact.tolist() == [True]
+
+
+def test_exact_copies_are_paired_with_each_other():
+    prefiltered: tuple = prefilter_texts([TEXT, EDITED_TEXT, EDITED_TEXT, TEXT], 0.8, min_jaccard=0.9)
+    pairs: dict[tuple[int, int], float] = as_pairs(*expand_prefiltered_pairs(*NO_PAIRS, *prefiltered))
+    assert pairs == pytest.approx({(0, 1): 37 / 39, (0, 2): 37 / 39, (1, 3): 37 / 39, (2, 3): 37 / 39,
+                                   (0, 3): 1.0, (1, 2): 1.0})
+
+
+def test_pairs_of_representative_are_repeated_for_its_exact_copies():
+    prefiltered: tuple = prefilter_texts([TEXT, OTHER_TEXT, TEXT, TEXT], 0.8, min_jaccard=0.9)
+    # The search over the embedded representatives found the pair of the first and the second of them
+    found: tuple = (torch.tensor([0]), torch.tensor([1]), torch.tensor([0.85]))
+    pairs: dict[tuple[int, int], float] = as_pairs(*expand_prefiltered_pairs(*found, *prefiltered))
+    assert pairs == pytest.approx({(0, 1): 0.85, (1, 2): 0.85, (1, 3): 0.85, (0, 2): 1.0, (0, 3): 1.0, (2, 3): 1.0})
+
+    # Clusters need only the copies connected with the texts they are assigned to
+    pairs = as_pairs(*expand_prefiltered_pairs(*found, *prefiltered, all_pairs=False))
+    assert pairs == pytest.approx({(0, 1): 0.85, (0, 2): 1.0, (0, 3): 1.0})
@@ -0,0 +1,124 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from dataloaders.qtest_api import QTestApiDataLoader
+
+PAGE_SIZE = 2
+
+
+# Local qTest server returning the given pages of the test cases and an empty page after the last one.
+# Pages listed in failing_pages respond with 503 to their first request
+class QtestStub:
+    def __init__(self, page_sizes: list[int], failing_pages: tuple = (), delay_seconds: float = 0.0):
+        self.pages: dict[int, list[dict]] = {}
+        pid: int = 0
+        for (page_number, page_size) in enumerate(page_sizes, start=1):
+            self.pages[page_number] = [create_test_case(pid + index) for index in range(page_size)]
+            pid += page_size
+        self.failing_pages = set(failing_pages)
+        self.delay_seconds = delay_seconds
+        self.requested_pages: list[int] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def respond(self, page_number: int) -> tuple[int, list]:
+        with self.lock:
+            self.requested_pages.append(page_number)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failing: bool = page_number in self.failing_pages
+            self.failing_pages.discard(page_number)
+        try:
+            time.sleep(self.delay_seconds)
+            return (503, []) if failing else (200, self.pages.get(page_number, []))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def create_test_case(pid: int) -> dict:
+    return {'pid': f'TC-{pid}', 'name': f'Test case {pid}', 'description': '<p>Description</p>',
+            'precondition': 'Precondition', 'test_steps': [{'description': 'Step', 'expected': 'Result'}]}
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    monkeypatch.setenv('BEARER_TOKEN', 'Bearer token')
+    servers: list[ThreadingHTTPServer] = []
+
+    def start(stub: QtestStub) -> str:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page_number: int = int(parse_qs(urlparse(self.path).query)['page'][0])
+                (status, body) = stub.respond(page_number)
+                payload: bytes = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        server: ThreadingHTTPServer = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}/'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def fetch_ids(base_url: str, max_concurrent_pages: int) -> list[list[str]]:
+    loader: QTestApiDataLoader = QTestApiDataLoader('1', PAGE_SIZE, base_url=base_url,
+                                                    max_concurrent_pages=max_concurrent_pages)
+    return [page['Id'].tolist() for page in loader.iterate_test_case_pages()]
+
+
+def test_pages_are_returned_in_order_until_short_page(serve):
+    stub: QtestStub = QtestStub([PAGE_SIZE, PAGE_SIZE, PAGE_SIZE, 1, PAGE_SIZE], delay_seconds=0.01)
+    pages: list[list[str]] = fetch_ids(serve(stub), max_concurrent_pages=3)
+    assert pages == [['TC-0', 'TC-1'], ['TC-2', 'TC-3'], ['TC-4', 'TC-5'], ['TC-6']]
+    # Pages after the short one may only be the ones already in flight
+    assert max(stub.requested_pages) <= 4 + 3
+
+
+def test_fetching_stops_at_empty_page(serve):
+    stub: QtestStub = QtestStub([PAGE_SIZE, PAGE_SIZE])
+    assert fetch_ids(serve(stub), max_concurrent_pages=1) == [['TC-0', 'TC-1'], ['TC-2', 'TC-3']]
+    assert stub.requested_pages == [1, 2, 3]
+
+
+def test_failed_page_is_retried(serve):
+    stub: QtestStub = QtestStub([PAGE_SIZE, PAGE_SIZE, 1], failing_pages=(2,))
+    assert fetch_ids(serve(stub), max_concurrent_pages=2) == [['TC-0', 'TC-1'], ['TC-2', 'TC-3'], ['TC-4']]
+    assert stub.requested_pages.count(2) == 2
+
+
+def test_pages_in_flight_are_bounded(serve):
+    stub: QtestStub = QtestStub([PAGE_SIZE] * 12, delay_seconds=0.05)
+    pages: list[list[str]] = fetch_ids(serve(stub), max_concurrent_pages=3)
+    assert [test_case_id for page in pages for test_case_id in page] == [f'TC-{pid}' for pid in range(24)]
+    assert 1 <= stub.max_in_flight <= 3
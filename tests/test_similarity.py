@@ -0,0 +1,57 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import pytest
+import torch
+
+from tests.helpers import CUTOFF, create_embeddings, dense_pairs
+from utils.similarity import extract_pairs_tiled, iterate_pairs_tiled
+
+
+@pytest.mark.parametrize('tile_size', [1, 10, 16, 53, 100])
+@pytest.mark.parametrize('start', [0, 1, 20, 52])
+def test_tiled_pairs_match_dense_scores(tile_size: int, start: int):
+    embeddings: torch.Tensor = create_embeddings()
+    expected: dict[tuple[int, int], float] = dense_pairs(embeddings, CUTOFF, start)
+    assert expected or start == 52
+
+    (rows, cols, scores) = extract_pairs_tiled(embeddings, CUTOFF, tile_size=tile_size, workers=3, start=start,
+                                               dtype='float32')
+    pairs: list[tuple[int, int]] = list(zip(rows.tolist(), cols.tolist()))
+    assert pairs == sorted(expected)
+    assert scores.tolist() == pytest.approx([expected[pair] for pair in pairs], abs=1e-5)
+
+
+@pytest.mark.parametrize('tile_size', [7, 16])
+def test_every_pair_is_found_in_exactly_one_tile(tile_size: int):
+    embeddings: torch.Tensor = create_embeddings()
+    pairs: list[tuple[int, int]] = [pair for (rows, cols, _) in iterate_pairs_tiled(embeddings, CUTOFF, tile_size,
+                                                                                     dtype='float32')
+                                    for pair in zip(rows.tolist(), cols.tolist())]
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == set(dense_pairs(embeddings, CUTOFF))
+
+
+@pytest.mark.parametrize('dtype', ['float16', 'int8'])
+def test_reduced_precision_pairs_are_close_to_dense_scores(dtype: str):
+    embeddings: torch.Tensor = create_embeddings()
+    expected: dict[tuple[int, int], float] = dense_pairs(embeddings, CUTOFF)
+    (rows, cols, scores) = extract_pairs_tiled(embeddings, CUTOFF, tile_size=10, dtype=dtype)
+    for (row, col, score) in zip(rows.tolist(), cols.tolist(), scores.tolist()):
+        if (row, col) in expected:
+            assert score == pytest.approx(expected[(row, col)], abs=0.03)
+    # Only the pairs close to the cut-off may be lost or added by the reduced precision
+    found: set[tuple[int, int]] = set(zip(rows.tolist(), cols.tolist()))
+    dense: dict[tuple[int, int], float] = dense_pairs(embeddings, CUTOFF - 0.03)
+    assert all(pair in dense for pair in found)
+    assert all(pair in found for (pair, score) in expected.items() if score > CUTOFF + 0.03)
@@ -0,0 +1,89 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import difflib
+import random
+import re
+from itertools import takewhile
+
+from utils.stringdiff import DIFF_MAX_TOKENS, bounded_matching_blocks, diff_executor, equalize, equalize_many
+
+
+# Diff of the texts as it was calculated before the long texts were bounded
+def reference_equalize(s1: str, s2: str) -> tuple[str, str]:
+    (l1, l2) = (re.split(r'\s+', s1), re.split(r'\s+', s2))
+    (res1, res2) = ([], [])
+    prev = difflib.Match(0, 0, 0)
+    for match in difflib.SequenceMatcher(a=l1, b=l2).get_matching_blocks():
+        if prev.a + prev.size != match.a:
+            res2.append('[[ ' + ' '.join(l1[prev.a + prev.size:match.a]) + ' ]]')
+        if prev.b + prev.size != match.b:
+            res1.append('[[ ' + ' '.join(l2[prev.b + prev.size:match.b]) + ' ]]')
+        res1.extend(l1[match.a:match.a + match.size])
+        res2.extend(l2[match.b:match.b + match.size])
+        prev = match
+    return ' '.join(res1), ' '.join(res2)
+
+
+def create_pairs(no_of_pairs: int = 2000) -> list[tuple[str, str]]:
+    randomizer: random.Random = random.Random(0)
+    words: list[str] = ['open', 'click', 'the', 'login', 'page', 'enter', 'valid', 'password', '']
+    return [(' '.join(randomizer.choice(words) for _ in range(randomizer.randint(0, 30))),
+             ' '.join(randomizer.choice(words) for _ in range(randomizer.randint(0, 30))))
+            for _ in range(no_of_pairs)]
+
+
+def test_short_texts_match_reference():
+    for (s1, s2) in create_pairs():
+        assert equalize(s1, s2) == reference_equalize(s1, s2)
+
+
+def test_long_texts_with_small_change_match_reference():
+    tokens: list[str] = [f'word{index}' for index in range(DIFF_MAX_TOKENS + 500)]
+    edited: list[str] = tokens[:700] + ['inserted'] + tokens[700:900] + ['replaced'] + tokens[901:]
+    (s1, s2) = (' '.join(tokens), ' '.join(edited))
+    assert equalize(s1, s2) == reference_equalize(s1, s2)
+    assert '[[ inserted ]]' in equalize(s1, s2)[0]
+
+
+def test_long_different_middles_are_marked_as_a_whole():
+    middle1: list[str] = [f'first{index}' for index in range(DIFF_MAX_TOKENS + 1)]
+    middle2: list[str] = [f'second{index}' for index in range(DIFF_MAX_TOKENS + 1)]
+    (s1, s2) = (' '.join(['start', *middle1, 'end']), ' '.join(['start', *middle2, 'end']))
+    assert equalize(s1, s2) == (f'start [[ {" ".join(middle2)} ]] end', f'start [[ {" ".join(middle1)} ]] end')
+
+    blocks: list[difflib.Match] = bounded_matching_blocks(s1.split(), s2.split(), DIFF_MAX_TOKENS)
+    assert sum(block.size for block in blocks) == 2
+    assert blocks[-1] == difflib.Match(len(middle1) + 2, len(middle2) + 2, 0)
+
+
+# Blocks must be ordered, match equal tokens and cover at least the common beginning and ending
+def test_bounded_matching_blocks_are_valid():
+    for (s1, s2) in create_pairs(500):
+        (l1, l2) = (s1.split(), s2.split())
+        for max_tokens in (0, 3, DIFF_MAX_TOKENS):
+            blocks: list[difflib.Match] = bounded_matching_blocks(l1, l2, max_tokens)
+            assert blocks[-1] == difflib.Match(len(l1), len(l2), 0)
+            for (block, next_block) in zip(blocks, blocks[1:]):
+                assert block.a + block.size <= next_block.a and block.b + block.size <= next_block.b
+            for block in blocks:
+                assert l1[block.a:block.a + block.size] == l2[block.b:block.b + block.size]
+            assert blocks[0].size == len(list(takewhile(lambda tokens: tokens[0] == tokens[1], zip(l1, l2))))
+
+
+def test_equalize_many_in_worker_processes():
+    pairs: list[tuple[str, str]] = create_pairs() * 2
+    with diff_executor(len(pairs), workers=2) as executor:
+        assert executor is not None
+        assert equalize_many(pairs, executor) == [reference_equalize(s1, s2) for (s1, s2) in pairs]
+    assert equalize_many(pairs[:10]) == [reference_equalize(s1, s2) for (s1, s2) in pairs[:10]]
@@ -0,0 +1,160 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import hashlib
+from collections import OrderedDict
+from os import environ
+from threading import Lock
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+import torch
+from sklearn.cluster import MiniBatchKMeans
+from torch import Tensor
+
+# Number of nearest neighbours looked up for every item
+ANN_TOP_K = int(environ.get("DEDUPE_ANN_TOP_K", 10))
+# Number of the closest inverted lists scanned for every query
+ANN_PROBES = int(environ.get("DEDUPE_ANN_PROBES", 8))
+# Lookups of fewer queries are answered by the exact search, building the index costs more than scanning the corpus
+ANN_MIN_QUERIES = int(environ.get("DEDUPE_ANN_MIN_QUERIES", 1000))
+# Number of the indexes of the recent corpora kept in memory
+INDEX_CACHE_SIZE = 2
+
+
+# Inverted file index: embeddings are split into lists by the nearest k-means centroid,
+# and only the lists of the closest centroids are scanned when searching for the neighbours
+class IvfIndex:
+    def __init__(self, no_of_lists: Optional[int] = None, no_of_probes: int = ANN_PROBES):
+        self.no_of_lists = no_of_lists
+        self.no_of_probes = no_of_probes
+        self.embeddings: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.list_ids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+
+    def fit(self, embeddings) -> 'IvfIndex':
+        self.embeddings = _normalize(embeddings)
+        length: int = len(self.embeddings)
+        no_of_lists: int = self.no_of_lists or int(np.sqrt(length))
+        no_of_lists = max(1, min(no_of_lists, length))
+
+        kmeans = MiniBatchKMeans(n_clusters=no_of_lists, n_init=3, random_state=0,
+                                 batch_size=max(1024, no_of_lists * 4)).fit(self.embeddings)
+        self.centroids = _normalize(kmeans.cluster_centers_)
+        assignments: np.ndarray = kmeans.labels_
+        # Ids of the embeddings grouped by the list, list i occupies list_ids[list_offsets[i]:list_offsets[i + 1]]
+        self.list_ids = np.argsort(assignments, kind='stable')
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=no_of_lists))))
+        return self
+
+    def search(self, queries, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        queries = _normalize(queries)
+        no_of_probes: int = min(self.no_of_probes, len(self.centroids))
+        probes: np.ndarray = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :no_of_probes]
+
+        scores: np.ndarray = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        ids: np.ndarray = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for (query_index, query) in enumerate(queries):
+            candidates: np.ndarray = np.concatenate(
+                [self.list_ids[self.list_offsets[probe]:self.list_offsets[probe + 1]] for probe in probes[query_index]])
+            candidate_scores: np.ndarray = self.embeddings[candidates] @ query
+            k: int = min(top_k, len(candidates))
+            best: np.ndarray = np.argpartition(-candidate_scores, k - 1)[:k]
+            best = best[np.argsort(-candidate_scores[best], kind='stable')]
+            scores[query_index, :k] = candidate_scores[best]
+            ids[query_index, :k] = candidates[best]
+        return scores, ids
+
+    # Function with the same output format as sentence_transformers.util.semantic_search
+    def semantic_search(self, queries, top_k: int) -> list[list[dict]]:
+        (scores, ids) = self.search(queries, top_k)
+        return [[{'corpus_id': int(corpus_id), 'score': float(score)}
+                 for (corpus_id, score) in zip(query_ids, query_scores) if corpus_id >= 0]
+                for (query_ids, query_scores) in zip(ids, scores)]
+
+
+# Indexes of the recent corpora by the hash of their embeddings, the same corpus is searched by many requests
+_index_cache: OrderedDict[str, IvfIndex] = OrderedDict()
+_index_cache_lock: Lock = Lock()
+
+
+# Function to get the index of the corpus, the index is built once per corpus and reused by the following searches
+def get_index(corpus_embeddings) -> IvfIndex:
+    embeddings: np.ndarray = _normalize(corpus_embeddings)
+    key: str = hashlib.blake2b(embeddings.tobytes(), digest_size=16).hexdigest() + str(embeddings.shape)
+    with _index_cache_lock:
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+    index: IvfIndex = IvfIndex().fit(embeddings)
+    with _index_cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+# Function to extract the pairs above the cut-off only among the nearest neighbours of every item.
+# The output matches utils.similarity.extract_pairs_tiled: pairs ordered by the first and then by the second index
+def extract_pairs_ann(embeddings: Tensor, cutoff: float, top_k: int = ANN_TOP_K,
+                      no_of_probes: int = ANN_PROBES) -> tuple[Tensor, Tensor, Tensor]:
+    index: IvfIndex = IvfIndex(no_of_probes=no_of_probes).fit(embeddings)
+    (scores, ids) = index.search(index.embeddings, top_k + 1)
+
+    rows: np.ndarray = np.repeat(np.arange(len(ids)), ids.shape[1])
+    cols: np.ndarray = ids.ravel()
+    pair_scores: np.ndarray = scores.ravel()
+    mask: np.ndarray = (cols >= 0) & (cols != rows) & (pair_scores > cutoff)
+    (rows, cols, pair_scores) = (rows[mask], cols[mask], pair_scores[mask])
+
+    # The same pair may be found from both sides, keep it once with the first index being the smaller one
+    (first, second) = (np.minimum(rows, cols), np.maximum(rows, cols))
+    (_, unique_positions) = np.unique(first * len(ids) + second, return_index=True)
+    return (torch.from_numpy(first[unique_positions]), torch.from_numpy(second[unique_positions]),
+            torch.from_numpy(pair_scores[unique_positions]))
+
+
+# Function to compare the pairs found with the index against the exact tiled search, used to tune top k and probes
+def recall_against_exact(embeddings: Tensor, cutoff: float, top_k: int = ANN_TOP_K,
+                         no_of_probes: int = ANN_PROBES) -> dict:
+    from utils.similarity import extract_pairs_tiled
+
+    start: float = perf_counter()
+    (exact_rows, exact_cols, _) = extract_pairs_tiled(embeddings, cutoff)
+    exact_seconds: float = perf_counter() - start
+
+    start = perf_counter()
+    (ann_rows, ann_cols, _) = extract_pairs_ann(embeddings, cutoff, top_k, no_of_probes)
+    ann_seconds: float = perf_counter() - start
+
+    exact_pairs: set = set(zip(exact_rows.tolist(), exact_cols.tolist()))
+    ann_pairs: set = set(zip(ann_rows.tolist(), ann_cols.tolist()))
+    return {
+        'top_k': top_k,
+        'probes': no_of_probes,
+        'exact_pairs': len(exact_pairs),
+        'ann_pairs': len(ann_pairs),
+        'recall': round(len(exact_pairs & ann_pairs) / len(exact_pairs), 4) if exact_pairs else 1.0,
+        'exact_seconds': round(exact_seconds, 3),
+        'ann_seconds': round(ann_seconds, 3)
+    }
+
+
+def _normalize(embeddings) -> np.ndarray:
+    if isinstance(embeddings, Tensor):
+        embeddings = embeddings.detach().cpu().numpy()
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms: np.ndarray = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
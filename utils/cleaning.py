@@ -13,6 +13,8 @@
 
 import re
 import string
+from concurrent.futures import ProcessPoolExecutor
+from os import environ
 
 from openpyxl.utils import escape
 from pandas import DataFrame
@@ -20,57 +22,65 @@ from pandas import DataFrame
 # Custom keywords to be removed from the document
 custom_kw = ["change", "processing", "verify", "check"]
 
+# Number of processes cleaning the documents, the documents are cleaned in the current process when it is 1
+CLEANING_WORKERS = int(environ.get("DEDUPE_CLEANING_WORKERS", 1))
+# Number of documents cleaned by a worker process at once
+CLEANING_CHUNK_SIZE = 2000
 
-# Function to extract needed columns from Data Frame and prepare them for further usage
-def clean_data_frame(data_frame: DataFrame, columns: list[str]) -> list[str]:
-    data_frame: DataFrame = data_frame[columns].apply(lambda value: '\n'.join(value.astype(str)).lower(), axis=1)
-    list_of_vals: list[str] = data_frame.tolist()
-
-    list_of_vals: list[str] = [re.sub("\d+", " ", document) for document in list_of_vals]
-    list_of_vals: list[str] = [" ".join([w for w in document.split() if len(w) > 1]) for document in list_of_vals]
-    list_of_vals: list[str] = ["".join(
-        [char.lower() for char in document if char not in string.punctuation]
-    ) for document in list_of_vals]
-    list_of_vals: list[str] = [re.sub("\W+", " ", document) for document in list_of_vals]
-    # Don't need to do the cleaning of stop words since they have an influence on the meaning of the sentences from testing perspective
-    # list_of_vals: list[str] = [remove_stopwords(document) for document in list_of_vals]
-    for kw in custom_kw:
-        list_of_vals: list[str] = [document.replace(kw, "") for document in list_of_vals]
-    return list_of_vals
+DIGITS_PATTERN = re.compile(r"\d+")
+NON_ALPHANUMERIC_PATTERN = re.compile(r"\W+")
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+# Single pattern to check whether the document contains any of the keywords. Keywords are still removed one after
+# another, since removing a keyword may join a new one, e.g. 'verchangeify', removed by the following replaces
+KEYWORDS_PATTERN = re.compile("|".join(re.escape(kw) for kw in custom_kw))
 
 
-# Function to cleanse document
-def cleanse_document(document, columns):
-    document = '\n'.join([document[column.strip()].lower() for column in columns])
-
+# Function to clean a single lower case document, shared by clean_data_frame and cleanse_document
+def clean_text(document: str) -> str:
     # remove numbers
-    document = re.sub("\d+", " ", document)
+    document = DIGITS_PATTERN.sub(" ", document)
 
-    # print("\n",document)
     # remove single characters
     document = " ".join([w for w in document.split() if len(w) > 1])
-    # print("--- join ",document)
 
-    # remove punctuations and convert characters to lower case
-    document = "".join(
-        [char.lower() for char in document if char not in string.punctuation]
-    )
+    # remove punctuations
+    document = document.translate(PUNCTUATION_TABLE)
 
     # Remove all non-alphanumeric characters
-    document = re.sub("\W+", " ", document)
+    document = NON_ALPHANUMERIC_PATTERN.sub(" ", document)
 
-    # Remove 'out of the box' stopwords
     # Don't need to do the cleaning of stop words since they have an influence on the meaning of the sentences from testing perspective
     # document = remove_stopwords(document)
-    # print("--- rem ",document)
 
     # Remove custom keywords
-    for kw in custom_kw:
-        document = document.replace(kw, "")
+    if KEYWORDS_PATTERN.search(document):
+        for kw in custom_kw:
+            document = document.replace(kw, "")
 
     return document
 
 
+def clean_texts(documents: list[str]) -> list[str]:
+    return [clean_text(document) for document in documents]
+
+
+# Function to extract needed columns from Data Frame and prepare them for further usage
+def clean_data_frame(data_frame: DataFrame, columns: list[str], workers: int = CLEANING_WORKERS) -> list[str]:
+    list_of_vals: list[str] = ['\n'.join(values).lower()
+                               for values in data_frame[columns].astype(str).itertuples(index=False, name=None)]
+    if workers > 1 and len(list_of_vals) > CLEANING_CHUNK_SIZE:
+        chunks: list[list[str]] = [list_of_vals[start:start + CLEANING_CHUNK_SIZE]
+                                   for start in range(0, len(list_of_vals), CLEANING_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return [document for chunk in executor.map(clean_texts, chunks) for document in chunk]
+    return clean_texts(list_of_vals)
+
+
+# Function to cleanse document
+def cleanse_document(document, columns):
+    return clean_text('\n'.join([document[column.strip()].lower() for column in columns]))
+
+
 # Function to clean the Data Frame from special characters, which may come from excel documents
 def clean_special_characters_from_data_frame(data_frame: DataFrame):
     for str_col in data_frame.select_dtypes(include=['object']).columns:
@@ -0,0 +1,69 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import numpy as np
+
+
+# Disjoint sets of the items with union by size and path halving
+class UnionFind:
+    def __init__(self, no_of_items: int):
+        self.parents = list(range(no_of_items))
+        self.sizes = [1] * no_of_items
+
+    def find(self, item: int) -> int:
+        parents: list[int] = self.parents
+        while parents[item] != item:
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+        return item
+
+    def union(self, first: int, second: int):
+        (first, second) = (self.find(first), self.find(second))
+        if first == second:
+            return
+        if self.sizes[first] < self.sizes[second]:
+            (first, second) = (second, first)
+        self.parents[second] = first
+        self.sizes[first] += self.sizes[second]
+
+
+# Function to group the pairs above the cut-off into the connected components. The representative of every cluster
+# is its most central item, the one with the highest sum of scores of its pairs. Returns the cluster numbers ordered
+# by the cluster size, the representatives and the other members
+def cluster_pairs(rows: np.ndarray, jrows: np.ndarray,
+                  scores: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    (items, pair_positions) = np.unique(np.concatenate([rows, jrows]), return_inverse=True)
+    (first, second) = (pair_positions[:len(rows)], pair_positions[len(rows):])
+    union_find: UnionFind = UnionFind(len(items))
+    for (item1, item2) in zip(first.tolist(), second.tolist()):
+        union_find.union(item1, item2)
+    roots: np.ndarray = np.array([union_find.find(item) for item in range(len(items))], dtype=np.int64)
+
+    centrality: np.ndarray = np.zeros(len(items), dtype=np.float64)
+    np.add.at(centrality, first, scores)
+    np.add.at(centrality, second, scores)
+
+    # Items ordered by the root and then by the descending centrality, the first item of every root represents it
+    order: np.ndarray = np.lexsort((np.arange(len(items)), -centrality, roots))
+    (cluster_roots, first_positions, cluster_sizes) = np.unique(roots[order], return_index=True, return_counts=True)
+    representative_of_root: dict[int, int] = dict(zip(cluster_roots.tolist(), order[first_positions].tolist()))
+    representatives: np.ndarray = np.array([representative_of_root[root] for root in roots.tolist()], dtype=np.int64)
+
+    # Clusters are numbered from the largest one, clusters of the same size by their representatives
+    cluster_order: np.ndarray = np.lexsort((items[order[first_positions]], -cluster_sizes))
+    number_of_root: dict[int, int] = {int(cluster_roots[position]): number
+                                      for (number, position) in enumerate(cluster_order.tolist(), start=1)}
+    clusters: np.ndarray = np.array([number_of_root[root] for root in roots.tolist()], dtype=np.int64)
+
+    members: np.ndarray = np.flatnonzero(representatives != np.arange(len(items)))
+    return clusters[members], items[representatives[members]], items[members]
@@ -0,0 +1,155 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import fcntl
+import json
+import logging
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from hashlib import sha256
+from os import environ, listdir, makedirs, path, replace
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# Folder the corpora of the incremental deduplication are persisted to
+CORPUS_PATH = environ.get("DEDUPE_CORPUS_PATH", "./corpus")
+
+ITEM_COLUMNS = ['id', 'text', 'hash']
+PAIR_COLUMNS = ['id_1', 'id_2', 'score', 'composite_score']
+
+# Locks of the corpora folders, so concurrent requests don't update the same corpus at once
+_corpus_locks: dict[str, threading.Lock] = {}
+_corpus_locks_guard = threading.Lock()
+
+logger = logging.getLogger('deduplicate')
+
+
+# Corpus of the already processed test cases: IDs, cleaned texts with their hashes, embeddings and the known
+# duplicate pairs. A separate corpus is kept for every combination of the model, ID column and compared columns
+class PersistedCorpus:
+    def __init__(self, model_name: str, idcol: str, cols: list[str], corpus_path: str = CORPUS_PATH):
+        signature: str = json.dumps({'model': model_name, 'id': idcol, 'columns': cols}, sort_keys=True)
+        self.signature = signature
+        self.directory = path.join(corpus_path, sha256(signature.encode('utf-8')).hexdigest()[:16])
+        self.items: DataFrame = DataFrame(columns=ITEM_COLUMNS)
+        self.embeddings: Optional[np.ndarray] = None
+        self.pairs: DataFrame = DataFrame(columns=PAIR_COLUMNS)
+        # Cut-off score the known pairs are complete for
+        self.cutoff: Optional[float] = None
+        with _corpus_locks_guard:
+            self.lock: threading.Lock = _corpus_locks.setdefault(self.directory, threading.Lock())
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    # Lock of the corpus shared by the threads of the service and by the other processes using the same corpora
+    # folder, like the incremental deduplication of the command line
+    @contextmanager
+    def locked(self) -> Iterator['PersistedCorpus']:
+        makedirs(path.dirname(self.directory), exist_ok=True)
+        with self.lock, open(f'{self.directory}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Function to load the current version of the corpus. A corpus whose files don't match its manifest is dropped,
+    # so it is rebuilt from scratch by the request instead of mixing the items with the wrong embeddings
+    def load(self) -> 'PersistedCorpus':
+        pointer_path: str = path.join(self.directory, 'current')
+        if not path.exists(pointer_path):
+            return self
+        with open(pointer_path, encoding='utf-8') as pointer_file:
+            version_directory: str = path.join(self.directory, pointer_file.read().strip())
+        try:
+            with open(path.join(version_directory, 'manifest.json'), encoding='utf-8') as manifest_file:
+                manifest: dict = json.load(manifest_file)
+            items: DataFrame = pd.read_csv(path.join(version_directory, 'items.csv'), dtype=str,
+                                           keep_default_na=False)
+            embeddings: np.ndarray = np.load(path.join(version_directory, 'embeddings.npy'), allow_pickle=False)
+            pairs: DataFrame = pd.read_csv(path.join(version_directory, 'pairs.csv'),
+                                           dtype={'id_1': str, 'id_2': str}, keep_default_na=False)
+        except (OSError, ValueError) as error:
+            logger.warning('Corpus %s is unreadable and is rebuilt: %s', self.directory, error)
+            return self
+        if len(items) != manifest['items'] or len(embeddings) != manifest['items'] or len(pairs) != manifest['pairs']:
+            logger.warning('Corpus %s does not match its manifest and is rebuilt', self.directory)
+            return self
+        (self.cutoff, self.items, self.embeddings, self.pairs) = (manifest['cutoff'], items, embeddings, pairs)
+        return self
+
+    # Every save writes a new version folder and then switches the pointer to it, so the readers see either
+    # the previous or the new version as a whole, and a failed save leaves the previous version intact.
+    # Only the formats, which can't execute code when they are loaded, are used
+    def save(self):
+        makedirs(self.directory, exist_ok=True)
+        version_directory: str = tempfile.mkdtemp(prefix='version_', dir=self.directory)
+        self.items.to_csv(path.join(version_directory, 'items.csv'), index=False)
+        with open(path.join(version_directory, 'embeddings.npy'), 'wb') as embeddings_file:
+            np.save(embeddings_file, self.embeddings, allow_pickle=False)
+        self.pairs.to_csv(path.join(version_directory, 'pairs.csv'), index=False)
+        with open(path.join(version_directory, 'manifest.json'), 'w', encoding='utf-8') as manifest_file:
+            json.dump({'signature': self.signature, 'cutoff': self.cutoff, 'items': len(self.items),
+                       'pairs': len(self.pairs)}, manifest_file)
+        version: str = path.basename(version_directory)
+        with open(path.join(self.directory, 'current.tmp'), 'w', encoding='utf-8') as pointer_file:
+            pointer_file.write(version)
+        replace(path.join(self.directory, 'current.tmp'), path.join(self.directory, 'current'))
+
+        # The previous versions are no longer read by anyone, since they are read and written only under the lock
+        for file_name in listdir(self.directory):
+            if file_name.startswith('version_') and file_name != version:
+                shutil.rmtree(path.join(self.directory, file_name), ignore_errors=True)
+
+    # Function to drop the items, which are deleted or whose text is changed, along with their pairs.
+    # Returns positions of the given ids, which are missing in the corpus and need to be embedded
+    def synchronize(self, ids: list[str], texts: list[str]) -> tuple[list[int], int]:
+        hashes: list[str] = [text_hash(text) for text in texts]
+        current_hashes: dict[str, str] = dict(zip(ids, hashes))
+        keep: np.ndarray = np.array([current_hashes.get(item_id) == item_hash
+                                     for (item_id, item_hash) in zip(self.items['id'], self.items['hash'])], dtype=bool)
+        invalidated_ids: set[str] = set(self.items['id'][~keep])
+        if invalidated_ids:
+            self.items = self.items[keep].reset_index(drop=True)
+            self.embeddings = self.embeddings[keep]
+            self.pairs = self.pairs[~(self.pairs['id_1'].isin(invalidated_ids) |
+                                      self.pairs['id_2'].isin(invalidated_ids))].reset_index(drop=True)
+
+        known_ids: set[str] = set(self.items['id'])
+        return [position for (position, item_id) in enumerate(ids) if item_id not in known_ids], len(invalidated_ids)
+
+    def append(self, ids: list[str], texts: list[str], embeddings: np.ndarray):
+        new_items: DataFrame = DataFrame({'id': ids, 'text': texts, 'hash': [text_hash(text) for text in texts]},
+                                         columns=ITEM_COLUMNS)
+        self.items = pd.concat([self.items, new_items], ignore_index=True)
+        embeddings = embeddings.astype(np.float32)
+        self.embeddings = embeddings if self.embeddings is None else np.concatenate([self.embeddings, embeddings])
+
+    def add_pairs(self, first_ids: list[str], second_ids: list[str], scores: list[float],
+                  composite_scores: list[float]):
+        new_pairs: DataFrame = DataFrame({'id_1': first_ids, 'id_2': second_ids, 'score': scores,
+                                          'composite_score': composite_scores}, columns=PAIR_COLUMNS)
+        self.pairs = pd.concat([self.pairs, new_pairs], ignore_index=True)
+
+    def clear_pairs(self):
+        self.pairs = DataFrame(columns=PAIR_COLUMNS)
+
+
+def text_hash(text: str) -> str:
+    return sha256(text.encode('utf-8')).hexdigest()
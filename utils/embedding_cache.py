@@ -0,0 +1,122 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import sqlite3
+import threading
+from contextlib import closing
+from hashlib import sha256
+from os import environ, makedirs, path
+from time import time
+
+import numpy as np
+import torch
+from torch import Tensor
+
+# Location of the SQLite database with cached embeddings
+EMBEDDING_CACHE_PATH = environ.get("DEDUPE_EMBEDDING_CACHE_PATH", "./embeddings_cache/embeddings.sqlite")
+# Maximal size of the cached embeddings in megabytes, least recently used embeddings are evicted above it.
+# Zero disables the cache
+EMBEDDING_CACHE_SIZE_MB = int(environ.get("DEDUPE_EMBEDDING_CACHE_SIZE_MB", 1024))
+
+# Maximal number of keys looked up with a single query, SQLite limits the number of query parameters
+LOOKUP_CHUNK_SIZE = 500
+
+
+# Persistent content-addressed store of the embeddings keyed by the hash of the model name and the encoded text.
+# SQLite in WAL mode makes it safe to be shared by concurrent requests and processes
+class EmbeddingCache:
+    def __init__(self, cache_path: str = EMBEDDING_CACHE_PATH, max_size_mb: int = EMBEDDING_CACHE_SIZE_MB):
+        self.cache_path = cache_path
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        if self.enabled:
+            makedirs(path.dirname(path.abspath(cache_path)), exist_ok=True)
+            with self.__connect() as connection:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, '
+                                   'size INTEGER NOT NULL, last_access REAL NOT NULL)')
+                connection.execute('CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)')
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size_bytes > 0
+
+    def __connect(self) -> closing[sqlite3.Connection]:
+        return closing(sqlite3.connect(self.cache_path, timeout=60, isolation_level=None))
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return sha256(f'{model_name}\0{text}'.encode('utf-8')).hexdigest()
+
+    # Function to encode the texts sending only the cache misses to the model.
+    # Returns the embeddings in the order of the texts and the statistics of the lookup
+    def encode(self, model, model_name: str, texts: list[str], **encode_kwargs) -> tuple[Tensor, dict]:
+        if not self.enabled:
+            embeddings: Tensor = model.encode(texts, convert_to_tensor=True, **encode_kwargs)
+            return embeddings, {'hits': 0, 'misses': len(texts)}
+
+        keys: list[str] = [self.key(model_name, text) for text in texts]
+        unique_keys: list[str] = list(dict.fromkeys(keys))
+        vectors: dict[str, np.ndarray] = self.__lookup(unique_keys)
+
+        missing_texts: dict[str, str] = {key: text for (key, text) in zip(keys, texts) if key not in vectors}
+        if missing_texts:
+            missing_vectors: np.ndarray = model.encode(list(missing_texts.values()), convert_to_numpy=True,
+                                                       **encode_kwargs).astype(np.float32)
+            vectors.update(zip(missing_texts.keys(), missing_vectors))
+            self.__store({key: vectors[key] for key in missing_texts})
+
+        embeddings: Tensor = torch.from_numpy(np.stack([vectors[key] for key in keys]))
+        return embeddings, {'hits': len(unique_keys) - len(missing_texts), 'misses': len(missing_texts)}
+
+    def __lookup(self, keys: list[str]) -> dict[str, np.ndarray]:
+        vectors: dict[str, np.ndarray] = {}
+        with self.__connect() as connection:
+            for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                chunk: list[str] = keys[start:start + LOOKUP_CHUNK_SIZE]
+                placeholders: str = ','.join('?' * len(chunk))
+                for (key, vector) in connection.execute(
+                        f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', chunk):
+                    vectors[key] = np.frombuffer(vector, dtype=np.float32)
+                connection.execute(f'UPDATE embeddings SET last_access = ? WHERE key IN ({placeholders})',
+                                   [time(), *chunk])
+        return vectors
+
+    def __store(self, vectors: dict[str, np.ndarray]):
+        now: float = time()
+        with self.lock, self.__connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany('INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) '
+                                       'VALUES (?, ?, ?, ?)',
+                                       [(key, vector.tobytes(), vector.nbytes, now)
+                                        for (key, vector) in vectors.items()])
+                self.__evict(connection)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+    # Function to remove the least recently used embeddings when the cache grows above the size limit
+    def __evict(self, connection: sqlite3.Connection):
+        (total_size,) = connection.execute('SELECT COALESCE(SUM(size), 0) FROM embeddings').fetchone()
+        if total_size <= self.max_size_bytes:
+            return
+        excess: int = total_size - self.max_size_bytes
+        evicted_keys: list[tuple[str]] = []
+        for (key, size) in connection.execute('SELECT key, size FROM embeddings ORDER BY last_access'):
+            if excess <= 0:
+                break
+            evicted_keys.append((key,))
+            excess -= size
+        connection.executemany('DELETE FROM embeddings WHERE key = ?', evicted_keys)
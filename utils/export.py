@@ -0,0 +1,121 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import shutil
+import tempfile
+from os import environ, listdir, makedirs, path
+from time import time
+from typing import Iterator
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.utils import escape
+from pandas import DataFrame
+
+# Format the results are written in: xlsx, csv or parquet
+OUTPUT_FORMAT = environ.get("DEDUPE_OUTPUT_FORMAT", "xlsx").lower()
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+# Folder with the folders of the results of every request
+RESULTS_PATH = environ.get("DEDUPE_RESULTS_PATH", path.join(tempfile.gettempdir(), 'dedupe_results'))
+# Results older than that are removed from the results folder
+RESULTS_TTL_SECONDS = int(environ.get("DEDUPE_RESULTS_TTL_SECONDS", 3600))
+# Maximal number of rows of an excel sheet including the header, the rest of the rows are written into the next sheets
+EXCEL_MAX_ROWS = 1048576
+SHEET_NAME = 'Deduplication Result'
+
+
+# Function to convert the escaped special characters of excel documents back, only strings containing them are changed
+def unescape_value(value):
+    if isinstance(value, str):
+        return escape.unescape(value) if '_x' in value else value
+    if pd.isna(value):
+        return None
+    return value
+
+
+# Function to iterate over the rows of the data frame converted into the values accepted by openpyxl
+def iterate_rows(data_frame: DataFrame) -> Iterator[list]:
+    for values in data_frame.itertuples(index=False, name=None):
+        yield [unescape_value(value.item() if hasattr(value, 'item') else value) for value in values]
+
+
+# Function to write the data frame row by row into the write-only workbook, which keeps only the current row
+# in memory instead of the whole workbook. Rows above the limit of excel are continued on the next sheets
+def write_excel(data_frame: DataFrame, output_path: str, sheet_name: str = SHEET_NAME,
+                max_rows: int = EXCEL_MAX_ROWS):
+    workbook: Workbook = Workbook(write_only=True)
+    header: list[str] = [str(column) for column in data_frame.columns]
+    sheet = None
+    rows_in_sheet: int = max_rows
+    for row in iterate_rows(data_frame):
+        if rows_in_sheet >= max_rows:
+            sheet = workbook.create_sheet(sheet_name if not workbook.sheetnames
+                                          else f'{sheet_name} {len(workbook.sheetnames) + 1}')
+            sheet.append(header)
+            rows_in_sheet = 1
+        sheet.append(row)
+        rows_in_sheet += 1
+    if sheet is None:
+        workbook.create_sheet(sheet_name).append(header)
+    workbook.save(output_path)
+
+
+# Function to unescape the text columns of the data frame for the formats written by pandas
+def unescape_data_frame(data_frame: DataFrame):
+    for column in data_frame.select_dtypes(include=['object']).columns:
+        data_frame[column] = data_frame[column].map(unescape_value)
+
+
+# Function to convert the values of the text columns into strings. Blank cells filled with the empty strings make
+# the numeric columns mix numbers and strings, which parquet can't store in a single column
+def stringify_data_frame(data_frame: DataFrame):
+    for column in data_frame.select_dtypes(include=['object']).columns:
+        data_frame[column] = data_frame[column].map(lambda value: value if value is None else str(value))
+
+
+# Function to remove the results of the previous requests older than the time to live
+def remove_expired_results(results_path: str = RESULTS_PATH, ttl_seconds: int = RESULTS_TTL_SECONDS):
+    if not path.isdir(results_path):
+        return
+    expiration: float = time() - ttl_seconds
+    for folder_name in listdir(results_path):
+        folder_path: str = path.join(results_path, folder_name)
+        try:
+            if path.getmtime(folder_path) < expiration:
+                shutil.rmtree(folder_path, ignore_errors=True)
+        except FileNotFoundError:
+            # Removed by the concurrent request
+            pass
+
+
+# Function to write the result into its own folder of the request, so the concurrent requests never overwrite
+# the results of each other. Returns the path of the written file
+def export_result(result_data_frame: DataFrame, file_name: str, output_format: str = OUTPUT_FORMAT,
+                  results_path: str = RESULTS_PATH) -> str:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Unknown output format {output_format}, expected one of {", ".join(OUTPUT_FORMATS)}')
+    remove_expired_results(results_path)
+    makedirs(results_path, exist_ok=True)
+    request_folder: str = tempfile.mkdtemp(prefix='result_', dir=results_path)
+    output_path: str = path.join(request_folder, f'{file_name}.{output_format}')
+    if output_format == 'xlsx':
+        write_excel(result_data_frame, output_path)
+    else:
+        unescape_data_frame(result_data_frame)
+        if output_format == 'csv':
+            result_data_frame.to_csv(output_path, index=False)
+        else:
+            stringify_data_frame(result_data_frame)
+            result_data_frame.to_parquet(output_path, index=False)
+    return output_path
+
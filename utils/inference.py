@@ -0,0 +1,117 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+from os import makedirs, path, replace
+
+import torch
+from torch import nn
+
+# Inference backends of the model: full precision torch, torch with int8 dynamic quantization of the linear layers,
+# the exported ONNX graph run by onnxruntime and the same graph with int8 dynamic quantization
+INFERENCE_BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+ONNX_OPSET_VERSION = 14
+
+
+# Transformer of the sentence transformers model returning only the token embeddings, used for the ONNX export
+class TokenEmbeddings(nn.Module):
+    def __init__(self, auto_model: nn.Module):
+        super().__init__()
+        self.auto_model = auto_model
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        return self.auto_model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids,
+                               return_dict=False)[0]
+
+
+# Drop-in replacement of the transformer inside the sentence transformers model running the exported ONNX graph.
+# The session is created lazily, so the model can be sent to the processes of the encoding pool
+class OnnxAutoModel(nn.Module):
+    def __init__(self, onnx_path: str, config, input_names: list[str]):
+        super().__init__()
+        self.onnx_path = onnx_path
+        self.config = config
+        self.input_names = input_names
+        self.session = None
+
+    def __getstate__(self) -> dict:
+        state: dict = self.__dict__.copy()
+        state['session'] = None
+        return state
+
+    def __get_session(self):
+        if self.session is None:
+            import onnxruntime
+
+            self.session = onnxruntime.InferenceSession(self.onnx_path, providers=['CPUExecutionProvider'])
+        return self.session
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None, return_dict: bool = False, **kwargs):
+        inputs: dict = {'input_ids': input_ids, 'attention_mask': attention_mask, 'token_type_ids': token_type_ids}
+        feed: dict = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        (token_embeddings,) = self.__get_session().run(None, feed)
+        return (torch.from_numpy(token_embeddings),)
+
+
+# Function to export the transformer of the model into the ONNX graph, optionally quantized to int8.
+# The graph is exported only once and reused from the models cache
+def export_onnx(model, onnx_path: str, quantize: bool = False) -> list[str]:
+    transformer = model[0]
+    features: dict = transformer.tokenize(['warm up'])
+    input_names: list[str] = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in features]
+    if path.exists(onnx_path):
+        return input_names
+
+    makedirs(path.dirname(onnx_path), exist_ok=True)
+    full_precision_path: str = onnx_path.replace('-int8.onnx', '.onnx') if quantize else onnx_path
+    if not path.exists(full_precision_path):
+        torch.onnx.export(TokenEmbeddings(transformer.auto_model).eval(),
+                          tuple(features[name] for name in input_names),
+                          full_precision_path + '.tmp',
+                          input_names=input_names,
+                          output_names=['token_embeddings'],
+                          dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in
+                                        [*input_names, 'token_embeddings']},
+                          opset_version=ONNX_OPSET_VERSION)
+        replace(full_precision_path + '.tmp', full_precision_path)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(full_precision_path, onnx_path + '.tmp', weight_type=QuantType.QInt8)
+        replace(onnx_path + '.tmp', onnx_path)
+    return input_names
+
+
+# Function to switch the loaded sentence transformers model to the given inference backend
+def apply_inference_backend(model, backend: str, model_name: str, device: str, cache_folder: str):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f'Unknown inference backend {backend}, expected one of {", ".join(INFERENCE_BACKENDS)}')
+    if backend == 'torch':
+        return model
+    if device != 'cpu':
+        raise ValueError(f'Inference backend {backend} runs only on cpu, not on {device}')
+
+    if backend == 'int8':
+        return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+    # onnxruntime is an optional dependency needed only by the ONNX backends
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError(f'onnxruntime package is required by inference backend {backend}')
+    quantize: bool = backend == 'onnx-int8'
+    onnx_path: str = path.join(cache_folder, 'onnx', model_name.replace('/', '_') + ('-int8' if quantize else '')
+                               + '.onnx')
+    input_names: list[str] = export_onnx(model, onnx_path, quantize)
+    transformer = model[0]
+    transformer.auto_model = OnnxAutoModel(onnx_path, transformer.auto_model.config, input_names)
+    return model
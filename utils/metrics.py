@@ -0,0 +1,168 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import json
+import logging
+import math
+import threading
+from bisect import bisect_left
+from os import environ
+from time import perf_counter
+
+from utils.profiling import StageProfiler
+
+# Sample the resident memory during the stages of every request to report their memory peaks
+SAMPLE_MEMORY = environ.get("DEDUPE_METRICS_SAMPLE_MEMORY", "true").lower() == "true"
+
+# Batch size the model encodes the texts with, used to count the encoded batches
+ENCODE_BATCH_SIZE = 32
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+logger = logging.getLogger('deduplicate')
+
+
+# Histogram with cumulative buckets in the format of Prometheus
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# Registry of the metrics of all the requests, rendered in the Prometheus text exposition format
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self.descriptions: dict[str, str] = {}
+
+    def observe(self, name: str, description: str, value: float, **labels):
+        with self.lock:
+            self.descriptions[name] = description
+            key: tuple[str, tuple] = (name, tuple(sorted(labels.items())))
+            histogram: Histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, description: str, value: float = 1, **labels):
+        with self.lock:
+            self.descriptions[name] = description
+            key: tuple[str, tuple] = (name, tuple(sorted(labels.items())))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self) -> str:
+        lines: list[str] = []
+        with self.lock:
+            for name in sorted({key[0] for key in self.counters}):
+                lines.append(f'# HELP {name} {self.descriptions[name]}')
+                lines.append(f'# TYPE {name} counter')
+                for ((metric_name, labels), value) in sorted(self.counters.items()):
+                    if metric_name == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value:g}')
+            for name in sorted({key[0] for key in self.histograms}):
+                lines.append(f'# HELP {name} {self.descriptions[name]}')
+                lines.append(f'# TYPE {name} histogram')
+                for ((metric_name, labels), histogram) in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric_name != name:
+                        continue
+                    cumulative: int = 0
+                    for (bound, count) in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(labels + (("le", f"{bound}"),))} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum:g}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics_registry = MetricsRegistry()
+
+
+# Metrics of a single request: durations and memory peaks of its stages and the counts of the processed items.
+# When the request is finished they are recorded into the registry and written as a structured log line
+class RequestMetrics:
+    def __init__(self, endpoint: str, registry: MetricsRegistry = metrics_registry):
+        self.endpoint = endpoint
+        self.registry = registry
+        self.profiler = StageProfiler(sample_memory=SAMPLE_MEMORY)
+        self.counts: dict[str, int] = {}
+        self.status = 'ok'
+        self.start = perf_counter()
+        self.seconds = 0.0
+
+    def stage(self, name: str):
+        return self.profiler.stage(name)
+
+    def count(self, name: str, value: int):
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    # Function to count the texts sent to the model and the batches they were encoded in
+    def count_encoded(self, no_of_texts: int, batch_size: int = ENCODE_BATCH_SIZE):
+        self.count('encoded_texts', no_of_texts)
+        self.count('encode_batches', math.ceil(no_of_texts / batch_size))
+
+    # Function to count the embedding cache statistics, only the misses are encoded by the model
+    def count_cache(self, cache_stats: dict):
+        self.count('cache_hits', cache_stats['hits'])
+        self.count('cache_misses', cache_stats['misses'])
+        self.count_encoded(cache_stats['misses'])
+
+    def fail(self):
+        self.status = 'error'
+
+    def finish(self):
+        self.seconds = perf_counter() - self.start
+        self.registry.increment('dedupe_requests_total', 'Number of the processed requests',
+                                endpoint=self.endpoint, status=self.status)
+        self.registry.observe('dedupe_request_duration_seconds', 'Duration of the requests',
+                              self.seconds, endpoint=self.endpoint, status=self.status)
+        for (stage_name, stage) in self.profiler.stages.items():
+            self.registry.observe('dedupe_stage_duration_seconds', 'Duration of the stages of the requests',
+                                  stage['seconds'], endpoint=self.endpoint, stage=stage_name)
+        for (count_name, value) in self.counts.items():
+            self.registry.increment(f'dedupe_{count_name}_total', f'Number of the {count_name}'.replace(
+                '_', ' '), value, endpoint=self.endpoint)
+        logger.info(json.dumps(self.to_dict()))
+
+    def to_dict(self) -> dict:
+        return {
+            'endpoint': self.endpoint,
+            'status': self.status,
+            'seconds': round(self.seconds, 4),
+            'stages': self.profiler.stages,
+            'counts': self.counts
+        }
+
+    # Function to describe the stages and the counts in a few lines shown with the result
+    def summary(self) -> str:
+        stages: str = ', '.join(f"{stage_name} {stage['seconds']:.2f}s"
+                                + (f" ({stage['peak_rss_mb']:.0f} MB peak)" if 'peak_rss_mb' in stage else '')
+                                for (stage_name, stage) in self.profiler.stages.items())
+        counts: str = ', '.join(f"{count_name.replace('_', ' ')} {value}"
+                                for (count_name, value) in self.counts.items())
+        return f'Stages: {stages}\nCounts: {counts}'
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for (name, value) in labels) + '}'
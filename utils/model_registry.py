@@ -0,0 +1,139 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import threading
+from os import environ, cpu_count
+
+import numpy as np
+import torch
+from tqdm import tqdm
+
+from utils.inference import apply_inference_backend
+
+# Name of the sentence transformers model used to compute embeddings
+MODEL_NAME = environ.get("DEDUPE_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# Device the model is run on, e.g. cpu or cuda
+MODEL_DEVICE = environ.get("DEDUPE_DEVICE", "cpu")
+# Folder the model weights are downloaded to
+MODELS_CACHE = environ.get("DEDUPE_MODELS_CACHE", "./models_cache")
+# Inference backend of the model: torch, int8, onnx or onnx-int8
+INFERENCE_BACKEND = environ.get("DEDUPE_INFERENCE_BACKEND", "torch").lower()
+# Number of processes encoding the sentences, the sentences are encoded in the current process when it is 1
+ENCODE_WORKERS = int(environ.get("DEDUPE_ENCODE_WORKERS", 1))
+# Minimal number of sentences worth spreading across the worker processes
+MULTI_PROCESS_MIN_SENTENCES = 1000
+# Number of sentences sent to a worker process at once
+MULTI_PROCESS_CHUNK_SIZE = 1000
+
+
+# Holder of the model shared by all the requests. The model is loaded and warmed up only once,
+# either at startup in background or lazily on the first use, and the inference is serialized with a lock
+class ModelRegistry:
+    def __init__(self, model_name: str = MODEL_NAME, device: str = MODEL_DEVICE, cache_folder: str = MODELS_CACHE,
+                 encode_workers: int = ENCODE_WORKERS, backend: str = INFERENCE_BACKEND):
+        self.model_name = model_name
+        self.device = device
+        self.cache_folder = cache_folder
+        self.backend = backend
+        self.encode_workers = encode_workers
+        self.show_progress_bar = False
+        self.model = None
+        self.pool = None
+        self.load_lock = threading.Lock()
+        self.inference_lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def get(self):
+        if self.model is None:
+            with self.load_lock:
+                if self.model is None:
+                    # Imported here, since the import of sentence transformers takes a lot of time
+                    from sentence_transformers import SentenceTransformer
+
+                    model = SentenceTransformer(self.model_name, device=self.device, cache_folder=self.cache_folder)
+                    model = apply_inference_backend(model, self.backend, self.model_name, self.device,
+                                                    self.cache_folder)
+                    model.encode(['warm up'])
+                    self.model = model
+                    self.ready.set()
+        return self.model
+
+    # Name the embeddings of the model are cached and persisted under, since the embeddings computed
+    # by the quantized backends differ from the full precision ones
+    @property
+    def model_key(self) -> str:
+        return self.model_name if self.backend == 'torch' else f'{self.model_name}@{self.backend}'
+
+    def encode(self, sentences: list[str], **kwargs):
+        model = self.get()
+        if self.encode_workers > 1 and len(sentences) >= MULTI_PROCESS_MIN_SENTENCES:
+            return self.encode_multi_process(sentences, **kwargs)
+        with self.inference_lock:
+            return model.encode(sentences, show_progress_bar=self.show_progress_bar, **kwargs)
+
+    # Function to spread the encoding across the pool of worker processes. Sentences are sorted by their token length
+    # before they are split into chunks, so the batches of every worker carry as little padding as possible
+    def encode_multi_process(self, sentences: list[str], batch_size: int = 32, convert_to_tensor: bool = False,
+                             convert_to_numpy: bool = True, normalize_embeddings: bool = False):
+        model = self.get()
+        with self.inference_lock:
+            pool: dict = self.__get_pool()
+            lengths: list[int] = [len(input_ids) for input_ids in model.tokenizer(
+                sentences, add_special_tokens=False, truncation=True, max_length=model.max_seq_length)['input_ids']]
+            order: np.ndarray = np.argsort(lengths, kind='stable')
+            chunks: list[np.ndarray] = [order[start:start + MULTI_PROCESS_CHUNK_SIZE]
+                                        for start in range(0, len(order), MULTI_PROCESS_CHUNK_SIZE)]
+            for (chunk_id, chunk) in enumerate(chunks):
+                pool['input'].put([chunk_id, batch_size, [sentences[position] for position in chunk]])
+
+            embeddings: np.ndarray = np.zeros((len(sentences), model.get_sentence_embedding_dimension()),
+                                              dtype=np.float32)
+            for _ in tqdm(range(len(chunks)), desc='Encoding', unit='chunk', disable=not self.show_progress_bar):
+                (chunk_id, chunk_embeddings) = pool['output'].get()
+                embeddings[chunks[chunk_id]] = chunk_embeddings
+
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return torch.from_numpy(embeddings) if convert_to_tensor else embeddings
+
+    def __get_pool(self) -> dict:
+        if self.pool is None:
+            # Every worker gets its share of the cores instead of all of them, otherwise the workers fight for the cores
+            previous_threads: str = environ.get('OMP_NUM_THREADS')
+            environ['OMP_NUM_THREADS'] = str(max(1, (cpu_count() or 1) // self.encode_workers))
+            try:
+                self.pool = self.get().start_multi_process_pool(target_devices=[self.device] * self.encode_workers)
+            finally:
+                if previous_threads is None:
+                    environ.pop('OMP_NUM_THREADS')
+                else:
+                    environ['OMP_NUM_THREADS'] = previous_threads
+        return self.pool
+
+    def stop_pool(self):
+        if self.pool is not None:
+            from sentence_transformers import SentenceTransformer
+
+            SentenceTransformer.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+    def is_ready(self) -> bool:
+        return self.ready.is_set()
+
+    def load_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.get, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,167 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import zlib
+from os import environ
+
+import numpy as np
+import torch
+from torch import Tensor
+
+# Collapse the exact and near-exact copies before the embedding by default
+PREFILTER = environ.get("DEDUPE_PREFILTER", "false").lower() == "true"
+# Minimal Jaccard similarity of the word shingles of the near-exact copies
+PREFILTER_JACCARD = float(environ.get("DEDUPE_PREFILTER_JACCARD", 0.9))
+# Number of words in a shingle
+SHINGLE_SIZE = 3
+# MinHash signature is split into the bands, texts sharing any band are compared as candidates.
+# With 16 bands of 8 rows the texts with Jaccard similarity 0.9 become candidates with probability above 0.9998
+LSH_BANDS = 16
+LSH_ROWS = 8
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+# Function to get the hashes of the word shingles of the text, a text shorter than a shingle is a shingle itself
+def shingle_hashes(text: str, shingle_size: int = SHINGLE_SIZE) -> frozenset:
+    words: list[str] = text.split()
+    if not words:
+        return frozenset()
+    return frozenset(zlib.crc32(' '.join(words[start:start + shingle_size]).encode('utf-8'))
+                     for start in range(max(1, len(words) - shingle_size + 1)))
+
+
+# Function to calculate MinHash signatures of the shingle sets with the universal hash functions
+def minhash_signatures(shingle_sets: list[frozenset], no_of_permutations: int = LSH_BANDS * LSH_ROWS,
+                       seed: int = 0) -> np.ndarray:
+    randomizer: np.random.Generator = np.random.default_rng(seed)
+    a: np.ndarray = randomizer.integers(1, MERSENNE_PRIME, size=(no_of_permutations, 1), dtype=np.int64)
+    b: np.ndarray = randomizer.integers(0, MERSENNE_PRIME, size=(no_of_permutations, 1), dtype=np.int64)
+    signatures: np.ndarray = np.full((len(shingle_sets), no_of_permutations), MERSENNE_PRIME, dtype=np.int64)
+    for (position, shingles) in enumerate(shingle_sets):
+        if shingles:
+            hashes: np.ndarray = np.fromiter(shingles, dtype=np.int64, count=len(shingles)) % MERSENNE_PRIME
+            signatures[position] = ((a * hashes + b) % MERSENNE_PRIME).min(axis=1)
+    return signatures
+
+
+def jaccard(shingles1: frozenset, shingles2: frozenset) -> float:
+    return len(shingles1 & shingles2) / len(shingles1 | shingles2)
+
+
+# Function to find the candidate pairs of the near-exact copies: the texts sharing any band of the signature
+def lsh_candidate_pairs(signatures: np.ndarray, bands: int = LSH_BANDS, rows: int = LSH_ROWS) -> set[tuple[int, int]]:
+    candidates: set[tuple[int, int]] = set()
+    for band in range(bands):
+        buckets: dict[bytes, list[int]] = {}
+        for (position, band_signature) in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(band_signature.tobytes(), []).append(position)
+        for bucket in buckets.values():
+            for (index, first) in enumerate(bucket):
+                candidates.update((first, second) for second in bucket[index + 1:])
+    return candidates
+
+
+# Function to collapse the exact copies of the cleaned texts by their hash and the near-exact copies found with
+# MinHash and LSH over the word shingles. Exact copies are assigned to the first occurrence of their text, and
+# the first occurrences to the earlier representative they are the most similar to, so only the representatives need
+# to be embedded. Near-exact copies are collapsed only when their score is above the cut-off as well, the others stay
+# representatives, so they are embedded and compared as usual instead of disappearing from the result.
+# Returns the positions of the representatives, the positions of the copies, the texts the copies are assigned to,
+# their scores: 1 for the exact copies and the Jaccard similarity of the shingles for the near-exact ones,
+# and whether the copies are exact
+def prefilter_texts(texts: list[str], cutoff: float, min_jaccard: float = PREFILTER_JACCARD) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    first_position_of_text: dict[str, int] = {}
+    (members, member_representatives, member_scores) = ([], [], [])
+    for (position, text) in enumerate(texts):
+        first_position: int = first_position_of_text.setdefault(text, position)
+        if first_position != position:
+            members.append(position)
+            member_representatives.append(first_position)
+            member_scores.append(1.0)
+    no_of_exact_copies: int = len(members)
+    unique_positions: list[int] = list(first_position_of_text.values())
+
+    shingle_sets: list[frozenset] = [shingle_hashes(texts[position]) for position in unique_positions]
+    # Texts without words would all share the same signature, they are left out of the near-exact search
+    hashed: list[int] = [index for (index, shingles) in enumerate(shingle_sets) if shingles]
+    neighbours: dict[int, list[tuple[int, float]]] = {}
+    for (first, second) in lsh_candidate_pairs(minhash_signatures([shingle_sets[index] for index in hashed])):
+        (first, second) = (hashed[first], hashed[second])
+        score: float = jaccard(shingle_sets[first], shingle_sets[second])
+        if score >= min_jaccard and score > cutoff:
+            neighbours.setdefault(second, []).append((first, score))
+
+    # Unique texts are in the order of their positions, so every text only looks back at the earlier representatives
+    is_representative: list[bool] = [True] * len(unique_positions)
+    for index in range(len(unique_positions)):
+        candidates: list[tuple[int, float]] = [(first, score) for (first, score) in neighbours.get(index, [])
+                                               if is_representative[first]]
+        if candidates:
+            (first, score) = max(candidates, key=lambda candidate: (candidate[1], -candidate[0]))
+            is_representative[index] = False
+            members.append(unique_positions[index])
+            member_representatives.append(unique_positions[first])
+            member_scores.append(score)
+
+    representatives: list[int] = [position for (index, position) in enumerate(unique_positions)
+                                  if is_representative[index]]
+    exact: np.ndarray = np.arange(len(members)) < no_of_exact_copies
+    order: np.ndarray = np.argsort(np.array(members, dtype=np.int64), kind='stable')
+    return (np.array(representatives, dtype=np.int64), np.array(members, dtype=np.int64)[order],
+            np.array(member_representatives, dtype=np.int64)[order],
+            np.array(member_scores, dtype=np.float32)[order], exact[order])
+
+
+# Function to map the pairs found among the embedded representatives back to the positions of the texts and to add
+# the pairs of the collapsed copies, all of them are above the cut-off. Exact copies share the embedding of their text,
+# so with all_pairs every pair of a text is repeated for its exact copies and the copies are paired with each other,
+# which gives the same pairs as the search without the prefilter. Otherwise every copy is paired only with the text
+# it is assigned to, which keeps the copies connected for the clusters without the pairs growing quadratically
+def expand_prefiltered_pairs(rows: Tensor, jrows: Tensor, scores: Tensor, representatives: np.ndarray,
+                             members: np.ndarray, member_representatives: np.ndarray, member_scores: np.ndarray,
+                             exact: np.ndarray, all_pairs: bool = True) -> tuple[Tensor, Tensor, Tensor]:
+    positions: np.ndarray = representatives[rows.cpu().numpy()]
+    jpositions: np.ndarray = representatives[jrows.cpu().numpy()]
+    pair_scores: np.ndarray = scores.cpu().float().numpy()
+    if not all_pairs:
+        return (torch.from_numpy(np.concatenate([positions, member_representatives])),
+                torch.from_numpy(np.concatenate([jpositions, members])),
+                torch.from_numpy(np.concatenate([pair_scores, member_scores])))
+
+    # Pairs of the distinct texts: found by the search and the near-exact copies with their representatives
+    positions = np.concatenate([positions, member_representatives[~exact]])
+    jpositions = np.concatenate([jpositions, members[~exact]])
+    pair_scores = np.concatenate([pair_scores, member_scores[~exact]])
+
+    group_of_text: dict[int, list[int]] = {}
+    for (member, text_position) in zip(members[exact].tolist(), member_representatives[exact].tolist()):
+        group_of_text.setdefault(text_position, [text_position]).append(member)
+    copied: np.ndarray = (np.isin(positions, list(group_of_text)) | np.isin(jpositions, list(group_of_text)))
+    (first, second, expanded_scores) = ([positions[~copied]], [jpositions[~copied]], [pair_scores[~copied]])
+    for (position, jposition, score) in zip(positions[copied].tolist(), jpositions[copied].tolist(),
+                                            pair_scores[copied].tolist()):
+        group: np.ndarray = np.array(group_of_text.get(position, [position]), dtype=np.int64)
+        jgroup: np.ndarray = np.array(group_of_text.get(jposition, [jposition]), dtype=np.int64)
+        first.append(np.repeat(group, len(jgroup)))
+        second.append(np.tile(jgroup, len(group)))
+        expanded_scores.append(np.full(len(group) * len(jgroup), score, dtype=np.float32))
+    for group in group_of_text.values():
+        (group_rows, group_cols) = np.triu_indices(len(group), k=1)
+        first.append(np.array(group, dtype=np.int64)[group_rows])
+        second.append(np.array(group, dtype=np.int64)[group_cols])
+        expanded_scores.append(np.ones(len(group_rows), dtype=np.float32))
+
+    (first, second) = (np.concatenate(first), np.concatenate(second))
+    return (torch.from_numpy(np.minimum(first, second)), torch.from_numpy(np.maximum(first, second)),
+            torch.from_numpy(np.concatenate(expanded_scores).astype(np.float32)))
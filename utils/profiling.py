@@ -0,0 +1,89 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import resource
+import sys
+import threading
+from contextlib import contextmanager
+from os import path, sysconf
+from time import perf_counter
+from typing import Iterator, Optional
+
+# Interval of sampling the resident memory of the process during a stage
+MEMORY_SAMPLING_INTERVAL_SECONDS = 0.01
+
+STATM_PATH = '/proc/self/statm'
+
+
+# Function to get the current resident memory of the process in bytes. Where /proc is not available,
+# the peak resident memory of the whole process is returned instead
+def resident_memory_bytes() -> int:
+    if path.exists(STATM_PATH):
+        with open(STATM_PATH) as statm_file:
+            return int(statm_file.read().split()[1]) * sysconf('SC_PAGE_SIZE')
+    max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux and in bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+# Sampler of the resident memory in background, used to find the memory peak of a stage
+class MemorySampler:
+    def __init__(self, interval: float = MEMORY_SAMPLING_INTERVAL_SECONDS):
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def __sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, resident_memory_bytes())
+
+    def start(self) -> 'MemorySampler':
+        self.peak = resident_memory_bytes()
+        self.thread = threading.Thread(target=self.__sample, name='memory-sampler', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> int:
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, resident_memory_bytes())
+        return self.peak
+
+
+# Profiler collecting the duration and the memory peak of the named stages of the pipeline
+class StageProfiler:
+    def __init__(self, sample_memory: bool = True):
+        self.sample_memory = sample_memory
+        self.stages: dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        sampler: Optional[MemorySampler] = MemorySampler().start() if self.sample_memory else None
+        start_memory: int = sampler.peak if sampler else 0
+        start: float = perf_counter()
+        try:
+            yield
+        finally:
+            seconds: float = perf_counter() - start
+            stage: dict = self.stages.setdefault(name, {'seconds': 0.0})
+            stage['seconds'] = round(stage['seconds'] + seconds, 4)
+            if sampler:
+                peak: int = sampler.stop()
+                stage['peak_rss_mb'] = round(max(stage.get('peak_rss_mb', 0), peak / 2 ** 20), 1)
+                stage['peak_growth_mb'] = round(max(stage.get('peak_growth_mb', 0),
+                                                    (peak - start_memory) / 2 ** 20), 1)
+
+    @property
+    def total_seconds(self) -> float:
+        return round(sum(stage['seconds'] for stage in self.stages.values()), 4)
@@ -0,0 +1,113 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+from utils.stringdiff import diff_executor, equalize_many
+
+SCORE_COLUMNS = ['Score', 'Composite Score']
+
+
+# Builder collecting the records column by column, so the data frame is created only once at the end
+# instead of copying the whole frame on every appended row
+class RecordBuilder:
+    def __init__(self):
+        self.columns: dict[str, list] = {}
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def append(self, record: dict):
+        for (key, value) in record.items():
+            column: list = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [np.nan] * self.length
+            column.append(value)
+        self.length += 1
+        # Columns missing in the record are filled with NaN, the same way DataFrame._append does
+        for column in self.columns.values():
+            if len(column) < self.length:
+                column.append(np.nan)
+
+    def build(self) -> DataFrame:
+        return DataFrame(self.columns)
+
+
+# Function to build the data frame of the pairs from the pair index arrays. Values of the rows are gathered
+# for all the pairs at once. Pairs are ordered by the score first, and the diffs of the compared columns are
+# calculated only for the top k of them when diff_top_k is given, the rest of the pairs keep their values as they are
+def build_pairs_data_frame(data_frame: DataFrame, idcol: str, cols: list[str], rows: np.ndarray, jrows: np.ndarray,
+                           scores: np.ndarray, composite_scores: np.ndarray, diff_top_k: int = 0) -> DataFrame:
+    order: np.ndarray = np.lexsort((-composite_scores, -scores))
+    (rows, jrows, scores, composite_scores) = (rows[order], jrows[order], scores[order], composite_scores[order])
+    no_of_diffs: int = min(diff_top_k, len(rows)) if diff_top_k > 0 else len(rows)
+    first: DataFrame = data_frame.iloc[rows]
+    second: DataFrame = data_frame.iloc[jrows]
+    columns: dict[str, object] = {
+        f'{idcol} #1': compact_id_column(first[idcol]),
+        f'{idcol} #2': compact_id_column(second[idcol]),
+        'Score': np.round(scores, 3).astype(np.float32),
+        'Composite Score': np.round(composite_scores, 3).astype(np.float32)
+    }
+    # Worker processes are started once for all the compared columns
+    with diff_executor(no_of_diffs) as executor:
+        for col in data_frame.columns:
+            if col != idcol:
+                if col in cols:
+                    (values1, values2) = (first[col].tolist(), second[col].tolist())
+                    diffs: list[tuple[str, str]] = equalize_many(
+                        list(zip(values1[:no_of_diffs], values2[:no_of_diffs])), executor)
+                    columns[f'{col} #1'] = [diff[0] for diff in diffs] + values1[no_of_diffs:]
+                    columns[f'{col} #2'] = [diff[1] for diff in diffs] + values2[no_of_diffs:]
+                else:
+                    columns[f'{col} #1'] = first[col].to_numpy()
+                    columns[f'{col} #2'] = second[col].to_numpy()
+    return DataFrame(columns)
+
+
+# Function to build the data frame of the clusters: every member of the cluster is compared with its representative,
+# so the diffs are calculated once per member instead of once per pair
+def build_clusters_data_frame(data_frame: DataFrame, idcol: str, cols: list[str], clusters: np.ndarray,
+                              representatives: np.ndarray, members: np.ndarray, scores: np.ndarray,
+                              composite_scores: np.ndarray, diff_top_k: int = 0) -> DataFrame:
+    order: np.ndarray = np.lexsort((-composite_scores, -scores))
+    clusters = clusters[order]
+    result_data_frame: DataFrame = build_pairs_data_frame(data_frame, idcol, cols, representatives[order],
+                                                          members[order], scores[order], composite_scores[order],
+                                                          diff_top_k)
+    (cluster_numbers, cluster_sizes) = np.unique(clusters, return_counts=True)
+    size_of_cluster: dict[int, int] = dict(zip(cluster_numbers.tolist(), (cluster_sizes + 1).tolist()))
+    result_data_frame.insert(0, 'Cluster', clusters.astype(np.int32))
+    result_data_frame.insert(1, 'Cluster Size', np.array([size_of_cluster[cluster] for cluster in clusters.tolist()],
+                                                         dtype=np.int32))
+    return result_data_frame
+
+
+# Function to store the IDs with the most compact dtype: downcast integers and categories for the repeated strings
+def compact_id_column(ids: Series) -> Series:
+    ids = ids.reset_index(drop=True)
+    if pd.api.types.is_integer_dtype(ids):
+        return pd.to_numeric(ids, downcast='integer')
+    if ids.dtype == object:
+        return ids.astype('category')
+    return ids
+
+
+# Function to widen float32 scores before writing them, otherwise their binary representation error is shown
+def widen_score_columns(data_frame: DataFrame):
+    for col in SCORE_COLUMNS:
+        if col in data_frame.columns:
+            data_frame[col] = data_frame[col].astype(np.float64).round(3)
@@ -0,0 +1,127 @@
+#  Copyright (c) 2023 EPAM Systems
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License
+
+from concurrent.futures import ThreadPoolExecutor
+from os import environ, cpu_count
+from typing import Iterator
+
+import torch
+from torch import Tensor
+from torch.nn.functional import normalize
+
+# Size of the square block of the scores matrix computed at once
+TILE_SIZE = int(environ.get("DEDUPE_TILE_SIZE", 2048))
+# Number of tiles computed in parallel
+SIMILARITY_WORKERS = int(environ.get("DEDUPE_SIMILARITY_WORKERS", cpu_count() or 1))
+# Candidate generation backend: 'exact' for the tiled brute-force search or 'ivf' for the approximate index
+SIMILARITY_BACKEND = environ.get("DEDUPE_SIMILARITY_BACKEND", "exact").lower()
+# Precision the normalized embeddings are kept in by the exact search: float32, float16 or int8
+EMBEDDING_DTYPE = environ.get("DEDUPE_EMBEDDING_DTYPE", "float32").lower()
+# Scale of the int8 embeddings, the components of the normalized embeddings are within [-1, 1]
+INT8_SCALE = 127
+
+
+# Function to normalize the embeddings and convert them into the given precision. Returns the converted embeddings
+# along with the factor the dot products of them are multiplied by to get the cosine similarities.
+# Embeddings already converted into the reduced precision are returned as they are
+def compress_embeddings(embeddings: Tensor, dtype: str = EMBEDDING_DTYPE) -> tuple[Tensor, float]:
+    if embeddings.dtype == torch.int8:
+        return embeddings, 1.0 / INT8_SCALE ** 2
+    if embeddings.dtype == torch.float16:
+        return embeddings, 1.0
+    embeddings = normalize(embeddings.float(), dim=1)
+    if dtype == 'float16':
+        return embeddings.half(), 1.0
+    if dtype == 'int8':
+        return torch.round(embeddings * INT8_SCALE).to(torch.int8), 1.0 / INT8_SCALE ** 2
+    if dtype != 'float32':
+        raise ValueError(f'Unknown embedding dtype {dtype}, expected float32, float16 or int8')
+    return embeddings, 1.0
+
+
+# Function to extract the (row, column, score) triples of the upper triangle of the scores matrix above the cut-off.
+# Offset is the difference between the first row and the first column of the block in the complete scores matrix
+def extract_pairs(cosine_scores: Tensor, cutoff: float, offset: int = 0) -> tuple[Tensor, Tensor, Tensor]:
+    mask: Tensor = torch.triu(cosine_scores > cutoff, diagonal=offset + 1)
+    rows, cols = torch.nonzero(mask, as_tuple=True)
+    return rows, cols, cosine_scores[rows, cols]
+
+
+# Function to iterate over the pairs above the cut-off tile by tile, so only the tile x tile blocks
+# of the scores matrix currently processed by the workers are kept in memory instead of the whole N x N matrix.
+# When start is given, only the pairs with the second index starting from it are looked for.
+# Embeddings are kept in the given reduced precision and only the rows of the current tile are converted back
+def iterate_pairs_tiled(embeddings: Tensor, cutoff: float, tile_size: int = TILE_SIZE,
+                        workers: int = SIMILARITY_WORKERS, start: int = 0,
+                        dtype: str = EMBEDDING_DTYPE) -> Iterator[tuple[Tensor, Tensor, Tensor]]:
+    (embeddings, scale) = compress_embeddings(embeddings, dtype)
+    length: int = len(embeddings)
+
+    def process_tile(tile: tuple[int, int]) -> tuple[Tensor, Tensor, Tensor]:
+        (start_row, start_col) = tile
+        scores: Tensor = (embeddings[start_row:start_row + tile_size].float()
+                          @ embeddings[start_col:start_col + tile_size].float().T)
+        if scale != 1.0:
+            scores *= scale
+        (rows, cols, tile_scores) = extract_pairs(scores, cutoff, start_row - start_col)
+        return rows + start_row, cols + start_col, tile_scores
+
+    tiles: list[tuple[int, int]] = [(start_row, start_col)
+                                    for start_col in range(start, length, tile_size)
+                                    for start_row in range(0, min(start_col + tile_size, length), tile_size)]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tiles)))) as executor:
+        yield from executor.map(process_tile, tiles)
+
+
+# Function to collect the pairs above the cut-off computed tile by tile, ordered by the row and then by the column
+def extract_pairs_tiled(embeddings: Tensor, cutoff: float, tile_size: int = TILE_SIZE,
+                        workers: int = SIMILARITY_WORKERS, start: int = 0,
+                        dtype: str = EMBEDDING_DTYPE) -> tuple[Tensor, Tensor, Tensor]:
+    hits: list[tuple[Tensor, Tensor, Tensor]] = list(iterate_pairs_tiled(embeddings, cutoff, tile_size, workers,
+                                                                         start, dtype))
+    if not hits:
+        empty: Tensor = torch.zeros(0, dtype=torch.long, device=embeddings.device)
+        return empty, empty, torch.zeros(0, device=embeddings.device)
+    rows: Tensor = torch.cat([hit[0] for hit in hits])
+    cols: Tensor = torch.cat([hit[1] for hit in hits])
+    scores: Tensor = torch.cat([hit[2] for hit in hits])
+    order: Tensor = torch.argsort(rows * len(embeddings) + cols)
+    return rows[order], cols[order], scores[order]
+
+
+# Function to calculate composite score of the pairs as a mean of per-column cosine similarities.
+# Embeddings are expected to be normalized, so the dot product is equal to the cosine similarity
+def composite_scores(column_embeddings: list[Tensor], rows: Tensor, cols: Tensor) -> Tensor:
+    scores: Tensor = torch.zeros(len(rows), dtype=torch.float32, device=rows.device)
+    for embeddings in column_embeddings:
+        scores += (embeddings[rows].float() * embeddings[cols].float()).sum(dim=1)
+    return scores / len(column_embeddings)
+
+
+# Function to find the pairs above the cut-off with the configured candidate generation backend
+def find_pairs(embeddings: Tensor, cutoff: float, backend: str = SIMILARITY_BACKEND) -> tuple[Tensor, Tensor, Tensor]:
+    if backend == 'ivf':
+        from utils.ann import extract_pairs_ann
+        return extract_pairs_ann(embeddings, cutoff)
+    return extract_pairs_tiled(embeddings, cutoff)
+
+
+# Function to find top k corpus entries for every query with the configured candidate generation backend
+def search(query_embeddings: Tensor, corpus_embeddings: Tensor, top_k: int,
+           backend: str = SIMILARITY_BACKEND) -> list[list[dict]]:
+    if backend == 'ivf':
+        from utils.ann import ANN_MIN_QUERIES, get_index
+        if len(query_embeddings) >= ANN_MIN_QUERIES:
+            return get_index(corpus_embeddings).semantic_search(query_embeddings, top_k)
+    from sentence_transformers import util
+    return util.semantic_search(query_embeddings, corpus_embeddings, score_function=util.dot_score, top_k=top_k)
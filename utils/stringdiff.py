@@ -13,16 +13,51 @@
 
 import difflib
 import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from os import environ
+from typing import ContextManager, Optional
+
+# Number of processes calculating the diffs, the diffs are calculated in the current process when it is 1
+DIFF_WORKERS = int(environ.get("DEDUPE_DIFF_WORKERS", 1))
+# Number of text pairs compared by a worker process at once
+DIFF_CHUNK_SIZE = 500
+# Maximal number of tokens compared with SequenceMatcher, longer texts are compared only after their common
+# beginning and ending are cut off, and the rest of them is marked as different when it is still too long
+DIFF_MAX_TOKENS = int(environ.get("DEDUPE_DIFF_MAX_TOKENS", 1000))
+
+TOKEN_SEPARATOR_PATTERN = re.compile(r'\s+')
 
 
 def tokenize(s):
-    return re.split('\s+', s)
+    return TOKEN_SEPARATOR_PATTERN.split(s)
 
 
 def untokenize(ts):
     return ' '.join(ts)
 
 
+# Function to find the matching blocks of the long token lists: the common beginning and ending are matched as they
+# are and only the rest is compared with SequenceMatcher, or marked as different when it is still too long
+def bounded_matching_blocks(l1: list[str], l2: list[str], max_tokens: int) -> list[difflib.Match]:
+    prefix: int = 0
+    limit: int = min(len(l1), len(l2))
+    while prefix < limit and l1[prefix] == l2[prefix]:
+        prefix += 1
+    suffix: int = 0
+    while suffix < limit - prefix and l1[-1 - suffix] == l2[-1 - suffix]:
+        suffix += 1
+
+    (middle1, middle2) = (l1[prefix:len(l1) - suffix], l2[prefix:len(l2) - suffix])
+    blocks: list[difflib.Match] = [difflib.Match(0, 0, prefix)]
+    if middle1 and middle2 and max(len(middle1), len(middle2)) <= max_tokens:
+        blocks.extend(difflib.Match(prefix + block.a, prefix + block.b, block.size)
+                      for block in difflib.SequenceMatcher(a=middle1, b=middle2).get_matching_blocks()[:-1])
+    blocks.append(difflib.Match(len(l1) - suffix, len(l2) - suffix, suffix))
+    blocks.append(difflib.Match(len(l1), len(l2), 0))
+    return blocks
+
+
 def equalize(s1, s2):
     l1 = tokenize(s1)
     l2 = tokenize(s2)
@@ -30,7 +65,12 @@ def equalize(s1, s2):
     res2 = []
     prev = difflib.Match(0, 0, 0)
 
-    for match in difflib.SequenceMatcher(a=l1, b=l2).get_matching_blocks():
+    if max(len(l1), len(l2)) > DIFF_MAX_TOKENS:
+        matching_blocks = bounded_matching_blocks(l1, l2, DIFF_MAX_TOKENS)
+    else:
+        matching_blocks = difflib.SequenceMatcher(a=l1, b=l2).get_matching_blocks()
+
+    for match in matching_blocks:
         if prev.a + prev.size != match.a:
             res2.append('[[ ' + untokenize(l1[prev.a + prev.size:match.a]) + ' ]]')
         if prev.b + prev.size != match.b:
@@ -42,3 +82,30 @@ def equalize(s1, s2):
         prev = match
 
     return untokenize(res1), untokenize(res2)
+
+
+def equalize_pairs(pairs: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    return [equalize(s1, s2) for (s1, s2) in pairs]
+
+
+# Function to create the pool of the worker processes shared by the diffs of all the compared columns of a result,
+# no pool is created when the diffs are calculated in the current process
+def diff_executor(no_of_pairs: int, workers: int = DIFF_WORKERS) -> ContextManager[Optional[ProcessPoolExecutor]]:
+    if workers > 1 and no_of_pairs > DIFF_CHUNK_SIZE:
+        return ProcessPoolExecutor(max_workers=workers)
+    return nullcontext()
+
+
+# Function to calculate the diffs of many pairs of texts. Every distinct pair is compared only once,
+# and large batches are spread across the worker processes of the executor when it is given
+def equalize_many(pairs: list[tuple[str, str]],
+                  executor: Optional[ProcessPoolExecutor] = None) -> list[tuple[str, str]]:
+    unique_pairs: list[tuple[str, str]] = list(dict.fromkeys(pairs))
+    if executor is not None and len(unique_pairs) > DIFF_CHUNK_SIZE:
+        chunks: list[list[tuple[str, str]]] = [unique_pairs[start:start + DIFF_CHUNK_SIZE]
+                                               for start in range(0, len(unique_pairs), DIFF_CHUNK_SIZE)]
+        diffs: list[tuple[str, str]] = [diff for chunk in executor.map(equalize_pairs, chunks) for diff in chunk]
+    else:
+        diffs: list[tuple[str, str]] = equalize_pairs(unique_pairs)
+    diff_of_pair: dict[tuple[str, str], tuple[str, str]] = dict(zip(unique_pairs, diffs))
+    return [diff_of_pair[pair] for pair in pairs]